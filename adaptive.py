@@ -0,0 +1,96 @@
+import numpy as np
+
+from evaluation import evaluate_metric_function, evaluate_on_axes
+
+#############################
+# Mallado adaptativo de curvas y superficies
+#############################
+
+def interpolation_error(axis, values):
+    """
+    Estima el error de la interpolación lineal en cada intervalo del eje (último
+    eje de `values`) como h**2/8 * |f''|, con f'' aproximada por diferencias
+    divididas de segundo orden en los nodos de ambos extremos. Usar los nodos y
+    no solo el punto medio evita dar por buenos intervalos cuyo punto medio cae
+    en un punto de inflexión.
+    """
+    h = np.diff(axis)
+    slopes = np.diff(values, axis=-1) / h
+    curvature = np.zeros(values.shape)
+    curvature[..., 1:-1] = 2 * np.diff(slopes, axis=-1) / (h[1:] + h[:-1])
+    curvature[..., 0] = curvature[..., 1]
+    curvature[..., -1] = curvature[..., -2]
+    node = np.abs(curvature)
+    return h**2 / 8 * np.maximum(node[..., :-1], node[..., 1:])
+
+def adaptive_metric_function(metric_func, parameters, selected_vars, range_inputs, n_points,
+                             tol=None, max_depth=4, max_evaluations=None):
+    """
+    Versión adaptativa de `evaluate_metric_function`. Parte de una malla gruesa
+    y, ronda a ronda, parte por la mitad los intervalos cuyo error de
+    interpolación lineal estimado (proporcional a la curvatura) supera `tol`
+    veces el rango de valores. Por defecto `tol` es el error que tendría la
+    malla uniforme de `n_points` (el error escala con h**2), de modo que la
+    superficie resultante es al menos igual de precisa que la uniforme pero
+    concentra los puntos donde la métrica se curva. Cada intervalo se subdivide como mucho
+    `max_depth` veces, así que el paso mínimo es el de la malla gruesa entre
+    2**max_depth: del orden de la mitad del paso de la malla uniforme de `n_points`.
+    Con 2 variables la malla es un producto tensorial no uniforme: se insertan
+    columnas o filas completas, lo que mantiene el formato de `go.Surface`.
+    Nunca se evalúan más de `max_evaluations` puntos (por defecto, los de la
+    malla uniforme); si el presupuesto no alcanza se refinan los peores intervalos,
+    y si ni siquiera cabe la malla gruesa (p. ej. con muy pocos puntos) se usa la
+    malla uniforme más fina que quepa. Retorna (x, y, n_evaluaciones) o (X, Y, Z, n_evaluaciones).
+    """
+    dims = len(selected_vars)
+    if max_evaluations is None:
+        max_evaluations = n_points**dims
+    n0 = max(3, (n_points - 1) // 2**(max_depth - 1) + 1)
+    if n0**dims > max_evaluations:
+        n_uniform = min(n_points, int(round(max_evaluations ** (1 / dims))))
+        while n_uniform > 1 and n_uniform**dims > max_evaluations:
+            n_uniform -= 1
+        n_uniform = max(n_uniform, 1)
+        return (*evaluate_metric_function(metric_func, parameters, selected_vars, range_inputs, n_uniform),
+                n_uniform**dims)
+    axes = [np.linspace(*range_inputs[var], n0) for var in selected_vars]
+    min_steps = [(axis[1] - axis[0]) / 2**max_depth for axis in axes]
+    values = evaluate_on_axes(metric_func, parameters, selected_vars, axes)
+    n_evaluations = values.size
+    scale = float(np.ptp(values)) or 1.0
+    if tol is None:
+        coarse_err = max(
+            interpolation_error(axes[dim], np.moveaxis(values, values.ndim - 1 - dim, -1)).max()
+            for dim in range(len(axes)))
+        tol = coarse_err / scale * ((n0 - 1) / max(n_points - 1, 1))**2
+
+    for _ in range(max_depth):
+        refined = False
+        for dim in range(len(axes)):
+            # En la matriz de valores x son las columnas (último eje) e y las filas;
+            # se trabaja con el eje refinado al final
+            along = values.ndim - 1 - dim
+            current = np.moveaxis(values, along, -1)
+            err = interpolation_error(axes[dim], current).reshape(-1, len(axes[dim]) - 1).max(axis=0)
+            idx = np.flatnonzero((err > tol * scale) & (np.diff(axes[dim]) > 1.5 * min_steps[dim]))
+            # Cada punto medio insertado cuesta una fila/columna completa de la malla
+            affordable = (max_evaluations - n_evaluations) // (values.size // len(axes[dim]))
+            if len(idx) > affordable:
+                idx = np.sort(idx[np.argsort(err[idx])[::-1][:max(affordable, 0)]])
+            if len(idx) == 0:
+                continue
+            refined = True
+            mids = 0.5 * (axes[dim][idx] + axes[dim][idx + 1])
+            probe = list(axes)
+            probe[dim] = mids
+            mid_values = np.moveaxis(evaluate_on_axes(metric_func, parameters, selected_vars, probe), along, -1)
+            n_evaluations += mid_values.size
+            axes[dim] = np.insert(axes[dim], idx + 1, mids)
+            values = np.moveaxis(np.insert(current, idx + 1, mid_values, axis=-1), -1, along)
+        if not refined:
+            break
+
+    if len(selected_vars) == 1:
+        return axes[0], values, n_evaluations
+    X, Y = np.meshgrid(*axes)
+    return X, Y, values, n_evaluations
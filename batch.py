@@ -0,0 +1,200 @@
+import csv
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+from evaluation import evaluate_metrics
+from experiments import EXPERIMENTS
+
+#############################
+# Evaluación por lotes sin interfaz
+#############################
+
+def metric_names(exp_type):
+    """Nombres de las métricas del experimento, en el orden de las columnas de salida."""
+    return list(EXPERIMENTS[exp_type]["metric_functions"])
+
+def evaluate_experiment(exp_type, points):
+    """
+    Evalúa todas las métricas del experimento sobre una matriz de puntos (N, D)
+    cuyas columnas siguen el orden de sus `parameters`; retorna (N, K).
+    """
+    experiment = EXPERIMENTS[exp_type]
+    return evaluate_metrics(experiment["metric_functions"], experiment["parameters"], points)
+
+@contextmanager
+def parallel_evaluator(exp_type, workers=None, chunk_size=2**16):
+    """
+    Contexto que entrega una función puntos (N, D) -> valores (N, K) equivalente
+    a `evaluate_experiment`, pero que reparte cada llamada en bloques entre un
+    pool de procesos que se mantiene abierto mientras dura el contexto (útil
+    con modelos costosos y muchas llamadas, como en el análisis de sensibilidad).
+    Con `workers` = 1 evalúa en el proceso actual.
+    """
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        yield lambda points: evaluate_experiment(exp_type, points)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def evaluate(points):
+            points = np.asarray(points, dtype=np.float64)
+            size = max(1, min(chunk_size, -(-len(points) // workers)))
+            chunks = [points[start:start + size] for start in range(0, len(points), size)]
+            return np.concatenate(list(pool.map(evaluate_experiment, itertools.repeat(exp_type), chunks)))
+        yield evaluate
+
+def input_columns(exp_type, header):
+    """
+    Posición en `header` de cada parámetro del experimento, en el orden de
+    `parameters`. Las columnas pueden llamarse por su clave ("TiCl3") o por su
+    nombre visible; las columnas que no son parámetros se ignoran.
+    """
+    experiment = EXPERIMENTS[exp_type]
+    header = [name.strip() for name in header]
+    positions = []
+    for key in experiment["parameters"]:
+        for name in (key, experiment["display_names"][key]):
+            if name in header:
+                positions.append(header.index(name))
+                break
+        else:
+            raise ValueError(f"Falta la columna '{key}' en la entrada")
+    return positions
+
+
+def _read_chunks(path, batch_size):
+    """
+    Recorre la entrada en bloques de `batch_size` filas sin cargarla entera.
+    CSV: retorna (cabecera, iterador de listas de líneas de texto).
+    NPY: retorna (None, iterador de bloques (n, D) de la matriz mapeada en memoria).
+    """
+    if path.endswith(".npy"):
+        data = np.load(path, mmap_mode="r")
+        return None, (np.array(data[start:start + batch_size]) for start in range(0, len(data), batch_size))
+    f = open(path, newline="", encoding="utf-8")
+    header = next(csv.reader([f.readline()]))
+
+    def lines():
+        with f:
+            while True:
+                chunk = [line for line in itertools.islice(f, batch_size) if line.strip()]
+                if not chunk:
+                    return
+                yield chunk
+    return header, lines()
+
+def _score_chunk(exp_type, chunk, usecols, text_output, float_format):
+    """
+    Evalúa un bloque de la entrada (líneas CSV o matriz) y, si la salida es CSV,
+    lo retorna ya formateado, de modo que el análisis y el formateo del texto
+    también se reparten entre los procesos.
+    """
+    if isinstance(chunk, list):
+        # Mismas reglas que la cabecera (csv): comas dentro de campos entre comillas
+        points = np.loadtxt(chunk, delimiter=",", quotechar='"', usecols=usecols, ndmin=2)
+    else:
+        points = chunk
+    values = evaluate_experiment(exp_type, points)
+    if not text_output:
+        return values
+    if isinstance(chunk, list):
+        # Las filas originales se copian tal cual y se les añaden las métricas
+        return _format_rows(values, float_format, [line.rstrip("\r\n") for line in chunk])
+    return _format_rows(np.hstack([points, values]), float_format)
+
+def _format_rows(values, float_format, prefixes=None):
+    """
+    Formatea la matriz como líneas CSV con una sola operación `%` sobre todo el
+    bloque (varias veces más rápido que `np.savetxt`, que formatea fila a fila).
+    """
+    row = ",".join([float_format] * values.shape[1]) + "\n"
+    if prefixes is None:
+        return (row * len(values)) % tuple(values.ravel().tolist())
+    row = "%s," + row
+    fields = [None] * (len(values) * (values.shape[1] + 1))
+    fields[::values.shape[1] + 1] = prefixes
+    for k in range(values.shape[1]):
+        fields[k + 1::values.shape[1] + 1] = values[:, k].tolist()
+    return (row * len(values)) % tuple(fields)
+
+
+class _NpyWriter:
+    """
+    Escribe una matriz .npy de K columnas fila a fila sin conocer de antemano el
+    número de filas: se reserva una cabecera de tamaño fijo que se reescribe al
+    cerrar con la forma definitiva.
+    """
+    _HEADER_SIZE = 128
+
+    def __init__(self, path, n_columns):
+        self.f = open(path, "wb")
+        self.n_columns = n_columns
+        self.n_rows = 0
+        self.f.write(b"\0" * self._HEADER_SIZE)
+
+    def write(self, values):
+        self.f.write(np.ascontiguousarray(values, dtype="<f8").tobytes())
+        self.n_rows += len(values)
+
+    def close(self):
+        header = repr({"descr": "<f8", "fortran_order": False, "shape": (self.n_rows, self.n_columns)})
+        header = header.ljust(self._HEADER_SIZE - 10 - 1) + "\n"
+        self.f.seek(0)
+        self.f.write(b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little") + header.encode("latin1"))
+        self.f.close()
+
+
+def score_file(exp_type, input_path, output_path, batch_size=2**16, workers=None, float_format="%.10g",
+               progress=None):
+    """
+    Evalúa todas las métricas del experimento para cada fila de `input_path`
+    (CSV con cabecera o .npy de forma (N, D)) y escribe los resultados en
+    `output_path` a medida que se calculan, respetando el orden de la entrada.
+      - Salida CSV: las columnas de la entrada seguidas de una por métrica.
+      - Salida .npy: una matriz (N, K) con las métricas en el orden de `metric_names`.
+    Con `workers` > 1 los bloques se reparten entre procesos (por defecto, uno
+    por núcleo); como mucho hay 2 * workers bloques en vuelo, así que la memoria
+    no depende del tamaño del archivo. `progress(filas)` se invoca tras cada bloque.
+    Retorna el número de filas evaluadas.
+    """
+    workers = workers or os.cpu_count()
+    header, chunks = _read_chunks(input_path, batch_size)
+    usecols = input_columns(exp_type, header) if header is not None else None
+    text_output = not output_path.endswith(".npy")
+    names = metric_names(exp_type)
+
+    if text_output:
+        writer = open(output_path, "w", newline="", encoding="utf-8")
+        columns = header if header is not None else list(EXPERIMENTS[exp_type]["parameters"])
+        csv.writer(writer, lineterminator="\n").writerow(list(columns) + names)
+    else:
+        writer = _NpyWriter(output_path, len(names))
+    n_rows = 0
+
+    def emit(result):
+        nonlocal n_rows
+        writer.write(result)
+        n_rows += result.count("\n") if text_output else len(result)
+        if progress is not None:
+            progress(n_rows)
+
+    try:
+        if workers == 1:
+            for chunk in chunks:
+                emit(_score_chunk(exp_type, chunk, usecols, text_output, float_format))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(_score_chunk, exp_type, chunk, usecols, text_output, float_format))
+                    if len(pending) >= 2 * workers:
+                        emit(pending.popleft().result())
+                while pending:
+                    emit(pending.popleft().result())
+    finally:
+        writer.close()
+    return n_rows
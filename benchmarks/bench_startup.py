@@ -0,0 +1,79 @@
+"""
+Mide el arranque en frío y el tiempo por re-ejecución del script de Streamlit.
+
+  - Arranque en frío: un proceso nuevo de Python importa Streamlit, ejecuta
+    `main.py` por primera vez y termina (mediana de `--cold` procesos).
+  - Re-ejecución: con la app ya cargada y las cachés de proceso calientes, tiempo
+    de cada `run()` sin cambios en los widgets (mediana de `--reruns`).
+
+Uso: python benchmarks/bench_startup.py [--cold 5] [--reruns 20]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, "main.py")
+
+# Se ejecuta en un proceso nuevo; imprime los tiempos de la primera ejecución en JSON
+_COLD_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t1 = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+t2 = time.perf_counter()
+heavy = [name for name in ("scipy", "plotly.express", "pareto", "optimization", "surrogate") if name in sys.modules]
+print(json.dumps({"import_streamlit": t1 - t0, "first_run": t2 - t1, "errors": len(at.exception), "loaded": heavy}))
+"""
+
+
+def cold_start(repeat):
+    """Tiempos de `repeat` arranques en procesos independientes."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run([sys.executable, "-c", _COLD_SCRIPT, MAIN], cwd=ROOT, check=True,
+                             capture_output=True, text=True).stdout
+        total = time.perf_counter() - start
+        samples.append({**json.loads(out.strip().splitlines()[-1]), "total": total})
+    return samples
+
+
+def rerun_times(repeat):
+    """Tiempo de cada re-ejecución del script con la app ya cargada."""
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(MAIN, default_timeout=120).run()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        at.run()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cold", type=int, default=5, help="número de arranques en frío")
+    parser.add_argument("--reruns", type=int, default=20, help="número de re-ejecuciones")
+    args = parser.parse_args()
+
+    cold = cold_start(args.cold)
+    print(f"Arranque en frío (mediana de {args.cold}):")
+    for field in ("total", "import_streamlit", "first_run"):
+        print(f"  {field:<18} {statistics.median(s[field] for s in cold) * 1e3:8.1f} ms")
+    print(f"  módulos pesados cargados al arrancar: {', '.join(cold[0]['loaded']) or 'ninguno'}")
+    if any(s["errors"] for s in cold):
+        print("  ¡la primera ejecución lanzó excepciones!")
+
+    times = rerun_times(args.reruns)
+    print(f"Re-ejecución (mediana de {args.reruns}): {statistics.median(times) * 1e3:.1f} ms "
+          f"(mín {min(times) * 1e3:.1f} ms, máx {max(times) * 1e3:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
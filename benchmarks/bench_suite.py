@@ -0,0 +1,180 @@
+"""
+Suite de rendimiento de la evaluación de métricas, las figuras y la optimización.
+
+Para cada experimento del registro y cada una de sus métricas mide:
+  - eval/grid1d y eval/grid2d: `evaluate_metric_function` en mallas de 1 y 2
+    variables con n_points en `--sizes` (por defecto 10, 50, 100 y 1000).
+  - figure/...: compactación de los datos y construcción de la figura
+    (`compact_surface` + `continuous_metric_figure`) y, aparte,
+    su serialización a JSON (lo que envía `st.plotly_chart`), con el tamaño en bytes.
+  - sweep/nd: barrido factorial completo de todas las variables (`sweep_metric`).
+  - optimize: optimización multi-arranque (`optimize_metric`).
+
+Los resultados se escriben en JSON ({"meta": ..., "results": {caso: tiempos}}).
+Con `--compare base.json` se comparan los tiempos mínimos con una ejecución anterior y
+el proceso termina con código 1 si algún caso es más lento que la tolerancia.
+
+Uso:
+  python benchmarks/bench_suite.py -o bench.json
+  python benchmarks/bench_suite.py -o nuevo.json --compare bench.json --tolerance 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+import plotly  # noqa: E402
+
+from evaluation import evaluate_metric_function  # noqa: E402
+from experiments import EXPERIMENTS  # noqa: E402
+from figures import compact_surface, continuous_metric_figure  # noqa: E402
+from optimization import optimize_metric  # noqa: E402
+from sweep import sweep_metric  # noqa: E402
+
+# Diferencias de tiempo por debajo de este umbral se consideran ruido
+NOISE_FLOOR = 1e-3
+
+
+def measure(fn, repeat, budget):
+    """
+    Ejecuta `fn` al menos una vez y hasta `repeat` veces mientras el tiempo
+    acumulado no supere `budget` segundos. Las llamadas rápidas van precedidas de
+    una de calentamiento que no se cuenta. Retorna (tiempos, último resultado).
+    """
+    start = time.perf_counter()
+    result = fn()
+    first = time.perf_counter() - start
+    times = [] if first < 0.1 else [first]
+    spent = first
+    while len(times) < repeat and (not times or spent < budget):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        spent += elapsed
+    return times, result
+
+
+def summarize(times, **extra):
+    return {"median": statistics.median(times), "min": min(times), "repeat": len(times), **extra}
+
+
+def run_cases(sizes, sweep_sizes, repeat, budget, selection=None, log=print):
+    """Ejecuta todos los casos cuyo nombre contenga `selection`; retorna {caso: resumen}."""
+    results = {}
+
+    def wanted(name):
+        return not selection or selection in name
+
+    def record(name, fn, **extra):
+        times, result = measure(fn, repeat, budget)
+        results[name] = summarize(times, **extra)
+        log(f"{name:<80} {results[name]['median'] * 1e3:10.2f} ms")
+        return result
+
+    for exp_type, experiment in EXPERIMENTS.items():
+        parameters = experiment["parameters"]
+        display_names = experiment["display_names"]
+        names = list(parameters)
+        for display_metric, metric_func in experiment["metric_functions"].items():
+            prefix = f"{exp_type}/{display_metric}"
+            for dims in (1, 2):
+                selected_vars = names[:dims]
+                for n_points in sizes:
+                    case = f"grid{dims}d/n={n_points}"
+                    stages = [f"{prefix}/{stage}/{case}" for stage in ("eval", "figure", "serialize")]
+                    if not any(wanted(name) for name in stages):
+                        continue
+                    evaluate = lambda: evaluate_metric_function(metric_func, parameters, selected_vars, parameters,
+                                                                n_points)
+                    surface = record(stages[0], evaluate, points=n_points**dims) if wanted(stages[0]) else evaluate()
+                    build = lambda: continuous_metric_figure(compact_surface(surface)[0], selected_vars,
+                                                             display_metric, display_names)
+                    fig = record(stages[1], build) if wanted(stages[1]) else build()
+                    if wanted(stages[2]):
+                        record(stages[2], fig.to_json, bytes=len(fig.to_json()))
+            for n_points in sweep_sizes:
+                if wanted(f"{prefix}/sweep/nd/n={n_points}"):
+                    record(f"{prefix}/sweep/nd/n={n_points}",
+                           lambda: sweep_metric(metric_func, parameters, n_points),
+                           points=n_points**len(names))
+            if wanted(f"{prefix}/optimize"):
+                record(f"{prefix}/optimize", lambda: optimize_metric(metric_func, parameters))
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plotly": plotly.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(baseline, current, tolerance):
+    """
+    Casos cuyo tiempo mínimo empeora más de `tolerance` (relativo) respecto a
+    `baseline`. Se compara el mínimo y no la mediana porque es mucho menos
+    sensible a la carga de la máquina.
+    """
+    regressions = []
+    for name, new in current.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        ratio = new["min"] / old["min"] if old["min"] else float("inf")
+        if ratio > 1 + tolerance and new["min"] - old["min"] > NOISE_FLOOR:
+            regressions.append((name, old["min"], new["min"], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-o", "--output", default="bench.json", help="archivo JSON de resultados")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 1000],
+                        help="n_points de las mallas de 1 y 2 variables")
+    parser.add_argument("--sweep-sizes", type=int, nargs="+", default=[10, 30],
+                        help="puntos por eje de los barridos de todas las variables")
+    parser.add_argument("--repeat", type=int, default=5, help="repeticiones máximas por caso")
+    parser.add_argument("--budget", type=float, default=2.0, help="segundos máximos por caso")
+    parser.add_argument("--filter", default=None, help="solo los casos cuyo nombre contenga este texto")
+    parser.add_argument("--compare", default=None, help="JSON de una ejecución anterior para comparar")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="empeoramiento relativo del tiempo mínimo admitido al comparar (por defecto 0.25)")
+    args = parser.parse_args()
+
+    results = run_cases(args.sizes, args.sweep_sizes, args.repeat, args.budget, args.filter)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"meta": metadata(), "results": results}, f, indent=2, ensure_ascii=False)
+    print(f"{len(results)} casos -> {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(baseline, results, args.tolerance)
+        for name, old, new, ratio in regressions:
+            print(f"MÁS LENTO  {name}: {old * 1e3:.2f} ms -> {new * 1e3:.2f} ms (x{ratio:.2f})")
+        if regressions:
+            sys.exit(1)
+        print(f"Sin regresiones respecto a {args.compare} (tolerancia {args.tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+
+#############################
+# Caché de superficies calculadas
+#############################
+
+class SurfaceCache:
+    """
+    Caché LRU de mallas evaluadas compartida por todas las sesiones del proceso.
+    Las entradas son tuplas de arrays (las mismas que retorna
+    `evaluate_metric_function`); se guardan como solo lectura y se expulsan las
+    menos usadas cuando el total de bytes supera `max_bytes`.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Retorna la entrada cacheada o None, actualizando los contadores."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """
+        Guarda `value` (array o tupla de arrays, que puede incluir escalares) y
+        expulsa entradas LRU si hace falta.
+        """
+        arrays = [v for v in (value if isinstance(value, tuple) else (value,)) if hasattr(v, "nbytes")]
+        for array in arrays:
+            array.setflags(write=False)
+        size = sum(array.nbytes for array in arrays)
+        if size > self.max_bytes:
+            return value
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+            self._entries[key] = (value, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+        return value
+
+    def get_or_compute(self, key, compute):
+        """Retorna la entrada de `key`, calculándola con `compute()` si no está."""
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def invalidate(self, scope):
+        """Elimina las entradas cuyo primer elemento de la clave es `scope` (p. ej. un experimento)."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == scope]:
+                self.nbytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Contadores de uso para monitorización."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "nbytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def surface_key(exp_type, metric_name, selected_vars, range_inputs, n_points):
+    """Clave de caché de una malla: experimento, métrica, variables, rangos y resolución."""
+    return (exp_type, metric_name, tuple(selected_vars),
+            tuple(tuple(float(v) for v in range_inputs[var]) for var in selected_vars),
+            int(n_points))
+
+
+# Instancia única por proceso: los módulos importados sobreviven a las re-ejecuciones
+# del script de Streamlit y se comparten entre sesiones.
+surface_cache = SurfaceCache()
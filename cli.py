@@ -0,0 +1,141 @@
+"""
+Línea de comandos de QuimicAI, sin interfaz de Streamlit.
+
+  python cli.py evaluate chem recetas.csv resultados.csv
+  python cli.py evaluate bio candidatos.npy metricas.npy --workers 8
+  python cli.py sensitivity mat --method sobol --samples 131072 --output sobol_mat.json
+  python cli.py warmup
+"""
+import argparse
+import json
+import sys
+import time
+
+from batch import metric_names, parallel_evaluator, score_file
+from experiments import EXPERIMENTS
+
+#############################
+# Subcomandos
+#############################
+
+def run_evaluate(args):
+    start = time.perf_counter()
+
+    def progress(n_rows):
+        print(f"\r{n_rows:,} filas evaluadas", end="", file=sys.stderr, flush=True)
+
+    n_rows = score_file(args.experiment, args.input, args.output, batch_size=args.batch_size,
+                        workers=args.workers, float_format=args.float_format,
+                        progress=None if args.quiet else progress)
+    elapsed = time.perf_counter() - start
+    if not args.quiet:
+        print(file=sys.stderr)
+    print(f"{n_rows:,} filas evaluadas en {elapsed:.2f} s ({n_rows / max(elapsed, 1e-9):,.0f} filas/s) -> {args.output}")
+    if args.output.endswith(".npy"):
+        print("Columnas: " + ", ".join(metric_names(args.experiment)))
+
+
+def run_sensitivity(args):
+    from sensitivity import morris_screening, sobol_indices
+
+    experiment = EXPERIMENTS[args.experiment]
+    start = time.perf_counter()
+    with parallel_evaluator(args.experiment, workers=args.workers) as evaluate:
+        if args.method == "sobol":
+            result = sobol_indices(experiment["metric_functions"], experiment["parameters"], n_samples=args.samples,
+                                   seed=args.seed, evaluate=evaluate)
+            columns = ("first", "total")
+        else:
+            result = morris_screening(experiment["metric_functions"], experiment["parameters"],
+                                      n_trajectories=args.samples, seed=args.seed, evaluate=evaluate)
+            columns = ("mu_star", "sigma")
+    elapsed = time.perf_counter() - start
+    print(f"{args.method}: {result['n_evaluations']:,} evaluaciones en {elapsed:.2f} s")
+    for k, metric in enumerate(result["metrics"]):
+        print(f"\n{metric}")
+        print(f"  {'parámetro':<12}" + "".join(f"{column:>14}" for column in columns))
+        for i, name in enumerate(result["parameters"]):
+            print(f"  {name:<12}" + "".join(f"{result[column][k, i]:>14.4g}" for column in columns))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({key: value.tolist() if hasattr(value, "tolist") else value for key, value in result.items()},
+                      f, indent=2, ensure_ascii=False)
+
+
+def run_warmup(args):
+    from store import ResultStore, STORE_MAX_BYTES, STORE_PATH, warm_up
+
+    store = ResultStore(args.store or STORE_PATH, max_bytes=STORE_MAX_BYTES)
+    unknown = [key for key in args.experiments if key not in EXPERIMENTS]
+    if unknown:
+        raise ValueError(f"experimentos desconocidos: {', '.join(unknown)} (disponibles: {', '.join(EXPERIMENTS)})")
+    experiments = {key: EXPERIMENTS[key] for key in (args.experiments or EXPERIMENTS)}
+    start = time.perf_counter()
+
+    def progress(exp_type, metric, computed):
+        if not args.quiet:
+            print(f"  {exp_type}: {metric} ({'calculado' if computed else 'ya estaba'})", file=sys.stderr)
+
+    computed = warm_up(experiments, store, optimize=not args.no_optimize, progress=progress)
+    elapsed = time.perf_counter() - start
+    stats = store.stats()
+    print(f"{computed} resultados calculados en {elapsed:.2f} s; el almacén tiene {stats['entries']} entradas "
+          f"({stats['nbytes'] / 2**20:.1f} MB) -> {store.path}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="quimicai", description="Herramientas de QuimicAI sin interfaz gráfica.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    evaluate = commands.add_parser(
+        "evaluate", help="evalúa todas las métricas de un experimento para cada fila de un archivo",
+        description="Evalúa todas las métricas de un experimento para cada fila de un CSV (con cabecera; "
+                    "columnas por clave o nombre visible) o de un .npy (N, D) en el orden de los parámetros.")
+    evaluate.add_argument("experiment", choices=list(EXPERIMENTS))
+    evaluate.add_argument("input", help="archivo de entrada (.csv o .npy)")
+    evaluate.add_argument("output", help="archivo de salida (.csv o .npy)")
+    evaluate.add_argument("--batch-size", type=int, default=2**16, help="filas por bloque (por defecto 65536)")
+    evaluate.add_argument("--workers", type=int, default=None,
+                          help="procesos en paralelo (por defecto, uno por núcleo; 1 = sin pool)")
+    evaluate.add_argument("--float-format", default="%.10g", help="formato de los números en la salida CSV")
+    evaluate.add_argument("--quiet", action="store_true", help="no mostrar el progreso")
+    evaluate.set_defaults(handler=run_evaluate)
+
+    sensitivity = commands.add_parser(
+        "sensitivity", help="análisis de sensibilidad global (Sobol o Morris) de todas las métricas",
+        description="Índices de Sobol (primer orden y totales) o cribado de Morris de cada parámetro para todas "
+                    "las métricas de un experimento.")
+    sensitivity.add_argument("experiment", choices=list(EXPERIMENTS))
+    sensitivity.add_argument("--method", choices=["sobol", "morris"], default="sobol")
+    sensitivity.add_argument("--samples", type=int, default=2**14,
+                             help="muestras base de Sobol (se evalúan samples*(D+2)) o trayectorias de Morris")
+    sensitivity.add_argument("--seed", type=int, default=0)
+    sensitivity.add_argument("--workers", type=int, default=None,
+                             help="procesos en paralelo (por defecto, uno por núcleo; 1 = sin pool)")
+    sensitivity.add_argument("--output", default=None, help="guardar el resultado en JSON")
+    sensitivity.set_defaults(handler=run_sensitivity)
+
+    warmup = commands.add_parser(
+        "warmup", help="precalcula en el almacén en disco las vistas por defecto de cada pestaña",
+        description="Calcula y guarda en el almacén de resultados compartido la vista con la que se abre cada "
+                    "pestaña (primera variable en todo su rango, para cada métrica) y la optimización de cada "
+                    "métrica, para que ninguna réplica tenga que calcularlas tras un despliegue o reinicio.")
+    warmup.add_argument("experiments", nargs="*", metavar="experiment",
+                        help=f"experimentos a precalcular (por defecto, todos: {', '.join(EXPERIMENTS)})")
+    warmup.add_argument("--store", default=None, help="ruta de la base de datos (por defecto, la de la aplicación)")
+    warmup.add_argument("--no-optimize", action="store_true", help="no precalcular las optimizaciones")
+    warmup.add_argument("--quiet", action="store_true", help="no mostrar el progreso")
+    warmup.set_defaults(handler=run_warmup)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.handler(args)
+    except ValueError as exc:  # entrada con un formato inesperado
+        sys.exit(f"error: {exc}")
+
+
+if __name__ == "__main__":
+    main()
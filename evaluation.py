@@ -0,0 +1,110 @@
+import math
+
+import numpy as np
+
+from expressions import BLOCK_ROWS, compile_metrics
+from instrumentation import count
+
+#############################
+# Motor de evaluación vectorizada de métricas
+#############################
+
+def default_value(rng):
+    """Retorna el promedio del rango."""
+    return sum(rng)/2
+
+def scalar_only(metric_func):
+    """
+    Marca una función métrica que solo acepta escalares (p. ej. modelos externos
+    con ramas `if` o llamadas a librerías no vectorizadas). El motor la evaluará
+    punto a punto en lugar de pasarle mallas completas.
+    """
+    metric_func.scalar_only = True
+    return metric_func
+
+def is_scalar_only(metric_func):
+    """Indica si la función métrica se declaró como solo escalar."""
+    return getattr(metric_func, "scalar_only", False)
+
+def call_metric(metric_func, args, shape):
+    """
+    Evalúa `metric_func` en una sola llamada con argumentos que difunden (broadcast)
+    a `shape` y retorna un array float64 con esa forma.
+    Las funciones marcadas con `scalar_only` se recorren elemento a elemento.
+    """
+    count("metric_calls")
+    count("points_evaluated", math.prod(shape))
+    if is_scalar_only(metric_func):
+        args = {key: np.broadcast_to(val, shape) for key, val in args.items()}
+        result = np.vectorize(metric_func, otypes=[np.float64])(**args)
+    else:
+        result = metric_func(**args)
+    return np.array(np.broadcast_to(result, shape), dtype=np.float64)
+
+def evaluate_on_axes(metric_func, parameters, selected_vars, axes):
+    """
+    Evalúa la métrica sobre el producto cartesiano de los ejes dados (uno por
+    variable seleccionada). Para 2 variables la salida tiene forma (len(y), len(x)),
+    igual que `np.meshgrid`. Los parámetros no seleccionados se fijan a su valor promedio.
+    """
+    args = {key: default_value(rng) for key, rng in parameters.items()}
+    if len(selected_vars) == 1:
+        x = axes[0]
+        args[selected_vars[0]] = x
+        return call_metric(metric_func, args, x.shape)
+    X, Y = np.meshgrid(*axes)
+    args[selected_vars[0]] = X
+    args[selected_vars[1]] = Y
+    return call_metric(metric_func, args, X.shape)
+
+def evaluate_metric_function(metric_func, parameters, selected_vars, range_inputs, n_points):
+    """
+    Evalúa la función métrica de forma continua.
+    Si se varía 1 parámetro: retorna vectores (x, y).
+    Si se varían 2 parámetros: retorna matrices (X, Y, Z).
+    Los parámetros no seleccionados se fijan a su valor promedio.
+    Toda la malla se pasa a la métrica en una única llamada vectorizada.
+    """
+    axes = [np.linspace(*range_inputs[var], n_points) for var in selected_vars]
+    if len(selected_vars) == 1:
+        return axes[0], evaluate_on_axes(metric_func, parameters, selected_vars, axes)
+    elif len(selected_vars) == 2:
+        X, Y = np.meshgrid(*axes)
+        return X, Y, evaluate_on_axes(metric_func, parameters, selected_vars, axes)
+
+def evaluate_points(metric_func, parameters, points):
+    """
+    Evalúa la métrica sobre una matriz de puntos (N, D) cuyas columnas siguen el
+    orden de `parameters`; retorna un vector de N valores.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    args = {key: points[..., i] for i, key in enumerate(parameters)}
+    return call_metric(metric_func, args, points.shape[:-1])
+
+def evaluate_metrics(metric_functions, parameters, points):
+    """
+    Evalúa todas las métricas de `metric_functions` sobre la misma matriz de
+    puntos (N, D) y retorna una matriz (N, K) con una columna por métrica.
+    Las métricas gaussianas y las fórmulas se compilan juntas
+    (`compile_metrics`): las subexpresiones comunes, como `term` de un modelo
+    compartido, se calculan una única vez, por bloques de `BLOCK_ROWS` filas con
+    búferes reutilizados y escribiendo directamente en la matriz de salida.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    flat = points.reshape(-1, points.shape[-1])
+    names = list(parameters)
+    metrics = tuple(metric_functions.values())
+    result = np.empty((len(flat), len(metrics)))
+    program, compiled = compile_metrics(metrics)
+    for i, metric_func in enumerate(metrics):
+        if i not in compiled:
+            result[:, i] = evaluate_points(metric_func, parameters, flat)
+    if program is not None:
+        count("metric_calls")
+        count("points_evaluated", len(flat))
+        pool = []
+        for start in range(0, len(flat), BLOCK_ROWS):
+            block = flat[start:start + BLOCK_ROWS]
+            program.run({name: block[:, j] for j, name in enumerate(names)},
+                        out=[result[start:start + BLOCK_ROWS, i] for i in compiled], pool=pool)
+    return result.reshape(points.shape[:-1] + (len(metrics),))
@@ -0,0 +1,185 @@
+import json
+import os
+import threading
+import tomllib
+from collections.abc import Mapping
+
+from expressions import ExpressionMetric
+from models import GaussianResponse
+
+#############################
+# Registro de experimentos cargado desde archivos de configuración
+#############################
+
+# Un archivo por experimento (JSON o TOML); la clave del experimento es el
+# nombre del archivo sin extensión. QUIMICAI_CONFIG_DIR permite usar otra carpeta.
+CONFIG_DIR = os.environ.get("QUIMICAI_CONFIG_DIR",
+                            os.path.join(os.path.dirname(os.path.abspath(__file__)), "configs"))
+CONFIG_EXTENSIONS = (".json", ".toml")
+
+# Ahorro de tiempo mostrado tras optimizar si la definición no indica `time_saved`
+DEFAULT_TIME_SAVED = "48 horas"
+
+
+def load_definition(path):
+    """Lee la definición de un experimento desde un archivo JSON o TOML."""
+    if path.endswith(".toml"):
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def default_maximize(display_metric):
+    """Los costos se minimizan; el resto de métricas se maximizan."""
+    return "Costo" not in display_metric
+
+def compile_experiment(definition, source="<definición>"):
+    """
+    Construye a partir de la definición todo lo que la interfaz necesita de un
+    experimento: parámetros (clave -> rango), nombres visibles, funciones
+    métricas, el mapa nombre visible -> clave y las constantes y modelos con
+    los que se pueden escribir fórmulas nuevas.
+    Cada entrada de `metrics` es gaussiana ({"model", "base", "gain"}) o una
+    fórmula ({"expression"}) sobre los parámetros, las `constants` y los
+    modelos de `models` (cada modelo vale su respuesta unitaria exp(-0.5 * term)).
+    Las métricas gaussianas de un mismo modelo comparten un único
+    `GaussianResponse`, de modo que `evaluate_metrics` calcula `term` una vez.
+    Un `data_file` relativo se resuelve respecto a la carpeta de `source`.
+    """
+    try:
+        parameters = {key: tuple(spec["range"]) for key, spec in definition["parameters"].items()}
+        display_names = {key: spec.get("display_name", key) for key, spec in definition["parameters"].items()}
+        constants = definition.get("constants", {})
+        models = definition.get("models", {})
+        metrics = definition["metrics"]
+    except (KeyError, TypeError) as exc:
+        raise ValueError(f"{source}: definición incompleta ({exc})") from None
+    for key, bounds in parameters.items():
+        if len(bounds) != 2 or not bounds[0] < bounds[1]:
+            raise ValueError(f"{source}: el rango de '{key}' debe ser [mínimo, máximo] con mínimo < máximo")
+    for name, spec in models.items():
+        if not isinstance(spec, dict):
+            raise ValueError(f"{source}: el modelo '{name}' debe ser una tabla")
+        if spec.get("type", "gaussian") != "gaussian":
+            raise ValueError(f"{source}: tipo de modelo desconocido '{spec['type']}' en '{name}'")
+        if "opt" not in spec or "sigma" not in spec:
+            raise ValueError(f"{source}: el modelo '{name}' necesita 'opt' y 'sigma'")
+        unknown = set(spec["opt"]) - set(parameters)
+        if unknown:
+            raise ValueError(f"{source}: el modelo '{name}' usa parámetros desconocidos: {', '.join(sorted(unknown))}")
+        missing = set(spec["opt"]) - set(spec["sigma"])
+        if missing:
+            raise ValueError(f"{source}: al modelo '{name}' le falta 'sigma' de: {', '.join(sorted(missing))}")
+        invalid = sorted(key for key in spec["opt"]
+                         if not (isinstance(spec["sigma"][key], (int, float)) and spec["sigma"][key] > 0))
+        if invalid:
+            raise ValueError(f"{source}: el modelo '{name}' necesita 'sigma' positivo en: {', '.join(invalid)}")
+
+    # Un GaussianResponse por modelo con una entrada base/gain por métrica
+    members = {}
+    for metric, spec in metrics.items():
+        if not isinstance(spec, dict):
+            raise ValueError(f"{source}: la métrica '{metric}' debe ser una tabla con 'model' o 'expression'")
+        if "model" in spec:
+            if spec["model"] not in models:
+                raise ValueError(f"{source}: modelo desconocido '{spec['model']}' en '{metric}'")
+            members.setdefault(spec["model"], []).append(metric)
+    responses = {}
+    for name, spec in models.items():
+        names = members.get(name, [])
+        responses[name] = GaussianResponse(
+            opt=spec["opt"], sigma=spec["sigma"],
+            base=[metrics[metric].get("base", 0.0) for metric in names] or 0.0,
+            gain=[metrics[metric].get("gain", 1.0) for metric in names] or 1.0)
+
+    metric_functions = {}
+    for metric, spec in metrics.items():
+        if "model" in spec:
+            metric_functions[metric] = responses[spec["model"]].metric(members[spec["model"]].index(metric))
+        elif "expression" in spec:
+            try:
+                metric_functions[metric] = ExpressionMetric(spec["expression"], parameters, constants, responses)
+            except ValueError as exc:
+                raise ValueError(f"{source}: métrica '{metric}': {exc}") from None
+        else:
+            raise ValueError(f"{source}: la métrica '{metric}' necesita 'model' o 'expression'")
+
+    data_file = definition.get("data_file")
+    if data_file is not None:
+        data_file = os.path.join(os.path.dirname(source), data_file)
+
+    return {
+        "tab": definition.get("tab", definition.get("title", source)),
+        "title": definition.get("title", ""),
+        "description": definition.get("description", ""),
+        "parameters": parameters,
+        "display_names": display_names,
+        "metric_functions": metric_functions,
+        "mapping": {v: k for k, v in display_names.items()},
+        "constants": constants,
+        "models": responses,
+        "data_file": data_file,
+        "time_saved": definition.get("time_saved", DEFAULT_TIME_SAVED),
+        "definition": definition,
+    }
+
+
+class ExperimentRegistry(Mapping):
+    """
+    Experimentos definidos en los archivos de `config_dir`, ordenados por su
+    campo `order` (y después por nombre). Las definiciones se leen al primer
+    uso, pero cada experimento se compila (`compile_experiment`) solo cuando se
+    pide con `registry[clave]`, una única vez por proceso.
+    """
+
+    def __init__(self, config_dir=CONFIG_DIR):
+        self.config_dir = config_dir
+        self._definitions = None
+        self._paths_by_key = None
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def _paths(self):
+        paths = {}
+        for filename in sorted(os.listdir(self.config_dir)):
+            key, extension = os.path.splitext(filename)
+            if extension in CONFIG_EXTENSIONS:
+                if key in paths:
+                    raise ValueError(f"Experimento '{key}' definido dos veces en {self.config_dir}")
+                paths[key] = os.path.join(self.config_dir, filename)
+        return paths
+
+    def definitions(self):
+        """Definiciones sin compilar (clave -> diccionario), leídas una sola vez."""
+        if self._definitions is None:
+            with self._lock:
+                if self._definitions is None:
+                    self._paths_by_key = self._paths()
+                    loaded = {key: load_definition(path) for key, path in self._paths_by_key.items()}
+                    self._definitions = dict(sorted(loaded.items(),
+                                                    key=lambda item: (item[1].get("order", float("inf")), item[0])))
+        return self._definitions
+
+    def definition(self, exp_type):
+        return self.definitions()[exp_type]
+
+    def __getitem__(self, exp_type):
+        compiled = self._compiled.get(exp_type)
+        if compiled is None:
+            definition = self.definitions()[exp_type]
+            with self._lock:
+                compiled = self._compiled.get(exp_type)
+                if compiled is None:
+                    compiled = compile_experiment(definition, source=self._paths_by_key[exp_type])
+                    self._compiled[exp_type] = compiled
+        return compiled
+
+    def __iter__(self):
+        return iter(self.definitions())
+
+    def __len__(self):
+        return len(self.definitions())
+
+
+# Registro del proceso: la importación no lee ni compila nada hasta el primer uso
+EXPERIMENTS = ExperimentRegistry()
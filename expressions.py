@@ -0,0 +1,392 @@
+import ast
+import functools
+import math
+
+import numpy as np
+
+from models import GaussianMetric
+
+#############################
+# Expresiones seguras para métricas definidas por fórmulas
+#############################
+
+# Funciones disponibles en las fórmulas (todas vectorizadas)
+FUNCTIONS = {
+    "exp": np.exp,
+    "log": np.log,
+    "log10": np.log10,
+    "sqrt": np.sqrt,
+    "abs": np.abs,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "tanh": np.tanh,
+    "minimum": np.minimum,
+    "maximum": np.maximum,
+}
+
+# Operaciones de los programas compilados: ufuncs de NumPy que aceptan `out=`
+OPERATIONS = {
+    **FUNCTIONS,
+    "add": np.add,
+    "subtract": np.subtract,
+    "multiply": np.multiply,
+    "divide": np.divide,
+    "power": np.power,
+    "square": np.square,
+    "negative": np.negative,
+}
+# El orden de los operandos de estas no cambia el resultado (ni su redondeo)
+_COMMUTATIVE = {"add", "multiply", "minimum", "maximum"}
+
+_BINARY_OPERATORS = {ast.Add: "add", ast.Sub: "subtract", ast.Mult: "multiply", ast.Div: "divide",
+                     ast.Pow: "power"}
+_UNARY_OPERATORS = (ast.UAdd, ast.USub)
+
+# Filas por bloque en `evaluate_metrics`: los búferes intermedios de un bloque
+# (unos pocos arrays de 128 KiB) caben en la caché L2
+BLOCK_ROWS = 2**14
+
+
+# Límites de las fórmulas: el análisis, la normalización y la compilación son
+# recursivos, y una fórmula enorme o muy anidada agotaría la pila de Python
+MAX_FORMULA_LENGTH = 1000
+MAX_FORMULA_DEPTH = 64
+
+
+class ExpressionError(ValueError):
+    """Fórmula con sintaxis no permitida o con nombres desconocidos."""
+
+
+def _parse(source):
+    """`ast.parse` de la fórmula, comprobando su longitud y la profundidad del árbol."""
+    source = source.strip()
+    if len(source) > MAX_FORMULA_LENGTH:
+        raise ExpressionError(f"Fórmula demasiado larga ({len(source)} caracteres; máximo {MAX_FORMULA_LENGTH})")
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as exc:
+        raise ExpressionError(f"Fórmula no válida '{source}': {exc.msg}") from None
+    except (RecursionError, MemoryError):
+        raise ExpressionError(f"Fórmula demasiado anidada '{source}'") from None
+    stack = [(tree, 1)]
+    while stack:
+        node, depth = stack.pop()
+        if depth > MAX_FORMULA_DEPTH:
+            raise ExpressionError(f"Fórmula demasiado anidada (máximo {MAX_FORMULA_DEPTH} niveles) en '{source}'")
+        stack.extend((child, depth + 1) for child in ast.iter_child_nodes(node))
+    return tree
+
+def parse_expression(source, names):
+    """
+    Analiza la fórmula `source` y comprueba que solo contiene números, los
+    nombres de `names`, las operaciones + - * / ** y llamadas a `FUNCTIONS`.
+    Nada más (atributos, índices, lambdas, comparaciones...) llega a evaluarse.
+    Retorna el árbol `ast.Expression`.
+    """
+    tree = _parse(source)
+    calls = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Expression, ast.Load) + tuple(_BINARY_OPERATORS) + _UNARY_OPERATORS):
+            continue
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+            continue
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, _UNARY_OPERATORS):
+            continue
+        if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+            # Todo en coma flotante: evita potencias enteras de tamaño arbitrario
+            try:
+                node.value = float(node.value)
+            except OverflowError:
+                raise ExpressionError(f"Número fuera de rango en '{source}'") from None
+            continue
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS:
+                raise ExpressionError(f"Solo se pueden llamar las funciones {', '.join(FUNCTIONS)} en '{source}'")
+            if node.keywords:
+                raise ExpressionError(f"Argumentos por nombre no permitidos en '{source}'")
+            if len(node.args) != FUNCTIONS[node.func.id].nin:
+                raise ExpressionError(f"'{node.func.id}' recibe {FUNCTIONS[node.func.id].nin} argumento(s) "
+                                      f"en '{source}'")
+            continue
+        if isinstance(node, ast.Name):
+            if id(node) in calls:
+                continue
+            if node.id in FUNCTIONS:
+                raise ExpressionError(f"'{node.id}' es una función y debe llamarse en '{source}'")
+            if node.id not in names:
+                raise ExpressionError(f"Nombre desconocido '{node.id}' en '{source}'")
+            continue
+        raise ExpressionError(f"Operación no permitida ({type(node).__name__}) en '{source}'")
+    return tree
+
+def expression_names(tree):
+    """Nombres de variables (no funciones) que usa el árbol, en orden de aparición."""
+    calls = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+    seen = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and id(node) not in calls:
+            seen.setdefault(node.id)
+    return list(seen)
+
+def normalize_formula(source):
+    """Forma canónica de la fórmula (sin espacios ni paréntesis redundantes), p. ej. para claves de caché."""
+    try:
+        return ast.unparse(_parse(source))
+    except RecursionError:
+        raise ExpressionError(f"Fórmula demasiado anidada '{source}'") from None
+
+
+#############################
+# Compilación a programas vectorizados con subexpresiones comunes
+#############################
+
+class Program:
+    """
+    Secuencia de ufuncs de NumPy que calcula varias métricas a la vez. Cada
+    resultado intermedio se escribe con `out=` en un búfer que vuelve a una
+    reserva en cuanto deja de usarse, de modo que una cadena de N operaciones
+    sobre una malla grande usa unos pocos búferes en lugar de N temporales.
+    Las operaciones cuyos operandos son todos escalares (p. ej. parámetros
+    fijos) se calculan como escalares.
+    """
+    __slots__ = ("inputs", "constants", "steps", "release", "outputs")
+
+    def __init__(self, inputs, constants, steps, release, outputs):
+        self.inputs = inputs        # [(nodo, nombre del parámetro)]
+        self.constants = constants  # {nodo: valor}
+        self.steps = steps          # [(nodo, ufunc, nodos operandos)]
+        self.release = release      # nodos que dejan de usarse tras cada paso
+        self.outputs = outputs      # nodo de cada métrica
+
+    def run(self, values, out=None, pool=None):
+        """
+        Evalúa el programa con `values` (nombre -> array o escalar, que difunden
+        entre sí). Cada paso tiene la forma difundida de sus propios operandos,
+        así que lo que depende de un solo eje de una malla abierta se calcula
+        sobre ese eje. Con `out` (un array por métrica) los resultados se
+        escriben allí directamente; `pool` es una lista de búferes 1D que se
+        reutilizan entre llamadas (p. ej. bloques de la misma matriz). Retorna
+        la lista de resultados.
+        """
+        results = dict(self.constants)
+        for node, name in self.inputs:
+            results[node] = values[name]
+        shape = np.broadcast_shapes(*(np.shape(values[name]) for _, name in self.inputs))
+        pool = [] if pool is None else pool
+        targets = {}
+        if out is not None:
+            for node, array in zip(self.outputs, out):
+                targets.setdefault(node, array)
+        owned = {}
+        for (node, ufunc, operands), release in zip(self.steps, self.release):
+            args = [results[operand] for operand in operands]
+            if all(np.ndim(arg) == 0 for arg in args):
+                results[node] = ufunc(*args)
+            else:
+                target = targets.get(node)
+                if target is None:
+                    step_shape = np.broadcast_shapes(*(np.shape(arg) for arg in args))
+                    base = _take_buffer(pool, math.prod(step_shape))
+                    target = base[:math.prod(step_shape)].reshape(step_shape)
+                    owned[node] = (base, target)
+                results[node] = ufunc(*args, out=target)
+            for operand in release:
+                if operand in owned:
+                    pool.append(owned.pop(operand)[0])
+
+        outputs = []
+        handed = set()
+        for k, node in enumerate(self.outputs):
+            value = results[node]
+            if out is not None:
+                if value is not out[k]:
+                    np.copyto(out[k], value)
+                outputs.append(out[k])
+            elif node in owned and node not in handed and value.shape == shape:
+                handed.add(node)
+                outputs.append(value)
+            else:
+                outputs.append(np.array(np.broadcast_to(value, shape), dtype=np.float64))
+        for node, (base, _) in owned.items():
+            if node not in handed:
+                pool.append(base)
+        return outputs
+
+
+def _take_buffer(pool, size):
+    """Saca de `pool` el búfer más pequeño con al menos `size` elementos, o crea uno nuevo."""
+    best = None
+    for i, buffer in enumerate(pool):
+        if buffer.size >= size and (best is None or buffer.size < pool[best].size):
+            best = i
+    return pool.pop(best) if best is not None else np.empty(size)
+
+
+class _Builder:
+    """
+    Construye el grafo de operaciones de un conjunto de métricas. Cada nodo se
+    identifica por su operación y sus operandos, así que una subexpresión que
+    aparece en varias fórmulas (o varias veces en una) es un único nodo y se
+    calcula una sola vez. Las operaciones entre constantes se pliegan.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.index = {}
+        self.terms = {}
+
+    def _node(self, key):
+        node = self.index.get(key)
+        if node is None:
+            node = self.index[key] = len(self.nodes)
+            self.nodes.append(key)
+        return node
+
+    def input(self, name):
+        return self._node(("input", name))
+
+    def const(self, value):
+        return self._node(("const", float(value).hex()))
+
+    def value(self, node):
+        key = self.nodes[node]
+        return float.fromhex(key[1]) if key[0] == "const" else None
+
+    def op(self, name, *operands):
+        values = [self.value(operand) for operand in operands]
+        if all(value is not None for value in values):
+            with np.errstate(all="ignore"):
+                return self.const(OPERATIONS[name](*values))
+        if name in _COMMUTATIVE:
+            operands = sorted(operands)
+        return self._node((name, *operands))
+
+    def expression(self, node, scope):
+        """Nodo de un árbol de `parse_expression`; `scope` da el nodo de cada nombre."""
+        if isinstance(node, ast.Expression):
+            return self.expression(node.body, scope)
+        if isinstance(node, ast.Constant):
+            return self.const(node.value)
+        if isinstance(node, ast.Name):
+            return scope[node.id]
+        if isinstance(node, ast.UnaryOp):
+            operand = self.expression(node.operand, scope)
+            return operand if isinstance(node.op, ast.UAdd) else self.op("negative", operand)
+        if isinstance(node, ast.BinOp):
+            left = self.expression(node.left, scope)
+            name = _BINARY_OPERATORS[type(node.op)]
+            # Como `array ** 2` en NumPy: cuadrado exacto en lugar de pow
+            if name == "power" and isinstance(node.right, ast.Constant) and node.right.value == 2.0:
+                return self.op("square", left)
+            return self.op(name, left, self.expression(node.right, scope))
+        return self.op(node.func.id, *(self.expression(arg, scope) for arg in node.args))
+
+    def gaussian_unit(self, model):
+        """
+        Respuesta unitaria exp(-0.5 * term) de un GaussianResponse, con
+        term = sum(((x - opt) / sigma)**2) sumado en el orden de `model.names`.
+        """
+        term = self.terms.get(id(model))
+        if term is None:
+            for name, opt, sigma in zip(model.names, model.opt, model.sigma):
+                deviation = self.op("divide", self.op("subtract", self.input(name), self.const(opt)),
+                                    self.const(sigma))
+                square = self.op("square", deviation)
+                term = square if term is None else self.op("add", term, square)
+            self.terms[id(model)] = term
+        return self.op("exp", self.op("multiply", self.const(-0.5), term))
+
+    def metric(self, metric_func):
+        """Nodo de salida de la métrica, o None si no es de un tipo compilable."""
+        if isinstance(metric_func, GaussianMetric):
+            model, index = metric_func.model, metric_func.index
+            return self.op("add", self.const(model.base[index]),
+                           self.op("multiply", self.const(model.gain[index]), self.gaussian_unit(model)))
+        if isinstance(metric_func, ExpressionMetric):
+            scope = {}
+            for name in metric_func.names:
+                if name in metric_func.factors:
+                    scope[name] = self.gaussian_unit(metric_func.factors[name])
+                elif name in metric_func.constants:
+                    scope[name] = self.const(metric_func.constants[name])
+                else:
+                    scope[name] = self.input(name)
+            return self.expression(metric_func.tree, scope)
+        return None
+
+    def program(self, outputs):
+        """Programa con los nodos necesarios para `outputs`, en orden topológico."""
+        needed = set()
+        stack = list(outputs)
+        while stack:
+            node = stack.pop()
+            if node not in needed:
+                needed.add(node)
+                key = self.nodes[node]
+                if key[0] not in ("input", "const"):
+                    stack.extend(key[1:])
+        inputs, constants, steps = [], {}, []
+        # Los operandos se crean antes que los nodos que los usan: el orden de creación es topológico
+        for node in sorted(needed):
+            key = self.nodes[node]
+            if key[0] == "input":
+                inputs.append((node, key[1]))
+            elif key[0] == "const":
+                constants[node] = float.fromhex(key[1])
+            else:
+                steps.append((node, OPERATIONS[key[0]], key[1:]))
+        last_use = {}
+        for position, (_, _, operands) in enumerate(steps):
+            for operand in operands:
+                last_use[operand] = position
+        release = [[] for _ in steps]
+        for operand, position in last_use.items():
+            if operand not in outputs:
+                release[position].append(operand)
+        return Program(inputs, constants, steps, release, list(outputs))
+
+
+@functools.lru_cache(maxsize=64)
+def compile_metrics(metric_functions):
+    """
+    Compila juntas las métricas de la tupla `metric_functions` que son
+    gaussianas o fórmulas, compartiendo las subexpresiones comunes a todas
+    (p. ej. `term` y exp(-0.5 * term) de un mismo modelo, o una constante
+    cinética que otra métrica reescala). Retorna (programa o None, posiciones de
+    las métricas compiladas); las demás se evalúan por separado. El resultado
+    se guarda por proceso para cada combinación de métricas.
+    """
+    builder = _Builder()
+    outputs, compiled = [], []
+    for position, metric_func in enumerate(metric_functions):
+        node = builder.metric(metric_func)
+        if node is not None:
+            outputs.append(node)
+            compiled.append(position)
+    return (builder.program(outputs) if outputs else None), compiled
+
+
+class ExpressionMetric:
+    """
+    Métrica definida por una fórmula, con la interfaz de las funciones métricas
+    (`metric_func(**args)`). `constants` son valores fijos y `factors` modelos
+    gaussianos cuyo nombre en la fórmula vale su respuesta unitaria
+    exp(-0.5 * term). La fórmula se compila una sola vez a un `Program`.
+    """
+    __slots__ = ("source", "tree", "names", "constants", "factors", "program")
+
+    def __init__(self, source, parameters, constants=None, factors=None):
+        self.constants = dict(constants or {})
+        self.factors = dict(factors or {})
+        self.tree = parse_expression(source, set(parameters) | set(self.constants) | set(self.factors))
+        self.source = source
+        self.names = expression_names(self.tree)
+        builder = _Builder()
+        try:
+            self.program = builder.program([builder.metric(self)])
+        except RecursionError:
+            raise ExpressionError(f"Fórmula demasiado anidada '{source}'") from None
+
+    def __call__(self, **kwargs):
+        return self.program.run(kwargs)[0]
@@ -0,0 +1,142 @@
+import numpy as np
+import plotly.graph_objects as go
+
+#############################
+# Construcción de figuras (sin dependencias de Streamlit)
+#############################
+
+# Puntos que se envían al navegador como máximo: una curva no necesita más
+# puntos que píxeles de ancho tiene el gráfico, ni una superficie más filas o
+# columnas de las que se distinguen en pantalla. Las mallas de los deslizadores
+# (hasta 100 puntos por eje) quedan por debajo; un frente de Pareto puede llegar
+# a contener todos los candidatos (hasta 2**17) y sí se recorta.
+MAX_CURVE_POINTS = 2000
+MAX_SURFACE_SIDE = 300
+MAX_SCATTER_POINTS = 5000
+
+# Error de redondeo admitido al pasar a float32, relativo al rango de valores
+FLOAT32_RTOL = 1e-5
+
+
+def as_compact_float(values, rtol=FLOAT32_RTOL):
+    """Convierte a float32 si el error de redondeo no supera `rtol` veces el rango de valores."""
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(over="ignore"):
+        compact = values.astype(np.float32)
+    finite = np.isfinite(values)
+    if not np.array_equal(np.isfinite(compact), finite):
+        # Valores fuera del rango de float32
+        return values
+    # Infinitos y NaN se conservan tal cual; el error se mide solo en los valores finitos
+    values_finite, compact_finite = values[finite], compact[finite]
+    scale = float(np.ptp(values_finite)) if values_finite.size else 0.0
+    scale = scale or float(np.abs(values_finite).max(initial=0.0)) or 1.0
+    if np.max(np.abs(compact_finite - values_finite), initial=0.0) <= rtol * scale:
+        return compact
+    return values
+
+def decimate_curve(y, max_points):
+    """
+    Índices de a lo sumo ~`max_points` puntos de la curva que conservan su forma:
+    en cada tramo se guardan el mínimo y el máximo, además de los extremos.
+    """
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    size = -(-n // max(max_points // 2, 1))
+    full = n // size * size
+    blocks = y[:full].reshape(-1, size)
+    offsets = np.arange(0, full, size)
+    keep = [[0, n - 1], offsets + blocks.argmin(axis=1), offsets + blocks.argmax(axis=1)]
+    if full < n:
+        keep.append([full + int(np.argmin(y[full:])), full + int(np.argmax(y[full:]))])
+    return np.unique(np.concatenate(keep))
+
+def decimate_axis(n, max_points):
+    """Índices equiespaciados (incluidos los extremos) para quedarse con `max_points` de `n`."""
+    if n <= max_points:
+        return np.arange(n)
+    return np.unique(np.linspace(0, n - 1, max_points).round().astype(np.intp))
+
+def compact_surface(surface, max_curve_points=MAX_CURVE_POINTS, max_surface_side=MAX_SURFACE_SIDE):
+    """
+    Reduce lo que se envía al navegador de la salida de `evaluate_metric_function`:
+      - Superficies: ejes 1D en lugar de las mallas X e Y completas (que son
+        productos exteriores de los ejes).
+      - float32 cuando el redondeo es inapreciable frente al rango de valores.
+      - Diezmado a la resolución de pantalla si hay más puntos de los visibles.
+    Retorna (x, y) o (eje x, eje y, Z) y un diccionario con los bytes que se
+    habrían enviado antes (dos trazas para la curva, mallas float64) y ahora.
+    """
+    if len(surface) == 2:
+        x, y = surface
+        original = 2 * (x.nbytes + y.nbytes)
+        keep = decimate_curve(y, max_curve_points)
+        compact = (as_compact_float(x[keep]), as_compact_float(y[keep]))
+    else:
+        X, Y, Z = surface
+        original = X.nbytes + Y.nbytes + Z.nbytes
+        rows = decimate_axis(Z.shape[0], max_surface_side)
+        cols = decimate_axis(Z.shape[1], max_surface_side)
+        compact = (as_compact_float(X[0, cols]), as_compact_float(Y[rows, 0]),
+                   as_compact_float(Z[np.ix_(rows, cols)]))
+    sent = sum(values.nbytes for values in compact)
+    return compact, {"original_bytes": original, "compact_bytes": sent, "saved_bytes": original - sent}
+
+def continuous_metric_figure(surface, selected_vars, display_metric, display_names):
+    """
+    Figura de la función continua: curva para (x, y) o superficie 3D para
+    (eje x, eje y, Z). Acepta también las mallas X, Y completas de
+    `evaluate_metric_function`, aunque conviene pasar antes por `compact_surface`.
+    """
+    if len(selected_vars) == 1:
+        x, y = surface
+        fig = go.Figure()
+        # Una sola traza con líneas y marcadores: los datos no se envían dos veces
+        fig.add_trace(go.Scatter(x=x, y=y, mode='lines+markers', name='Curva continua'))
+        fig.update_layout(title=f"{display_metric} vs {display_names[selected_vars[0]]}",
+                          xaxis_title=display_names[selected_vars[0]],
+                          yaxis_title=display_metric)
+    else:
+        x, y, Z = surface
+        if np.ndim(x) == 2:
+            x, y = x[0], y[:, 0]
+        fig = go.Figure(data=[go.Surface(x=x, y=y, z=Z, colorscale='Viridis')])
+        fig.update_layout(title=f"{display_metric} en función de {display_names[selected_vars[0]]} y {display_names[selected_vars[1]]}",
+                          scene=dict(
+                              xaxis_title=display_names[selected_vars[0]],
+                              yaxis_title=display_names[selected_vars[1]],
+                              zaxis_title=display_metric))
+    return fig
+
+def uncertainty_figure(result, selected_vars, display_metric, display_names, percentiles=(5, 95)):
+    """
+    Figura de la salida de `propagate_uncertainty`: curva nominal, media y banda
+    entre percentiles para 1 variable; superficie de la desviación estándar
+    para 2 variables.
+    """
+    if len(selected_vars) == 1:
+        x, nominal, mean, std, lower, upper = (as_compact_float(values) for values in result)
+        band = f"Banda P{percentiles[0]}-P{percentiles[1]}"
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=x, y=upper, mode='lines', line=dict(width=0), showlegend=False,
+                                 hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=x, y=lower, mode='lines', line=dict(width=0), fill='tonexty',
+                                 fillcolor='rgba(76, 175, 80, 0.25)', name=band))
+        fig.add_trace(go.Scatter(x=x, y=mean, mode='lines', name='Media'))
+        fig.add_trace(go.Scatter(x=x, y=nominal, mode='lines', name='Nominal', line=dict(dash='dash')))
+        fig.update_layout(title=f"{display_metric} vs {display_names[selected_vars[0]]} con incertidumbre",
+                          xaxis_title=display_names[selected_vars[0]],
+                          yaxis_title=display_metric)
+    else:
+        X, Y, nominal, mean, std, lower, upper = result
+        fig = go.Figure(data=[go.Surface(x=as_compact_float(X[0]), y=as_compact_float(Y[:, 0]),
+                                         z=as_compact_float(std), surfacecolor=as_compact_float(mean),
+                                         colorscale='Viridis',
+                                         colorbar=dict(title=dict(text="Media")))])
+        fig.update_layout(title=f"Desviación estándar de {display_metric} (color: media)",
+                          scene=dict(
+                              xaxis_title=display_names[selected_vars[0]],
+                              yaxis_title=display_names[selected_vars[1]],
+                              zaxis_title=f"σ {display_metric}"))
+    return fig
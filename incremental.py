@@ -0,0 +1,88 @@
+import math
+
+import numpy as np
+
+from evaluation import evaluate_on_axes
+
+#############################
+# Reevaluación incremental sobre una retícula diádica común
+#############################
+
+# Los deslizadores de rango avanzan en pasos de 1/100 del rango permitido; la
+# retícula más fina divide cada paso en 2**FINE_BITS partes
+SLIDER_DIVISIONS = 100
+FINE_BITS = 10
+
+
+def lattice_axis(allowed, value_range, n_points):
+    """
+    Eje de unos `n_points` puntos dentro de `value_range`, tomados de una retícula
+    anclada al rango permitido `allowed` con paso 2**e veces el paso más fino.
+    Como el paso solo depende de la resolución (no de los extremos elegidos),
+    al mover un deslizador los puntos interiores se mantienen y solo aparecen
+    franjas nuevas; al cambiar la resolución, la retícula gruesa es un
+    subconjunto de la fina. Los extremos del rango se añaden siempre.
+    Cada valor se calcula como low + m * fine a partir de su índice entero m,
+    así que el mismo punto produce siempre el mismo float.
+    """
+    low, high = allowed
+    fine = (high - low) / (SLIDER_DIVISIONS * 2**FINE_BITS)
+    start = round((value_range[0] - low) / fine)
+    stop = round((value_range[1] - low) / fine)
+    span = max(stop - start, 1)
+    # Exponente cuyo número de puntos está más cerca de n_points (en escala logarítmica)
+    exponent = min(range(0, int(math.log2(span)) + 2),
+                   key=lambda e: abs(math.log((span // 2**e + 1) / max(n_points, 1))))
+    step = 2**exponent
+    indices = np.arange(-(-start // step) * step, stop + 1, step)
+    indices = np.unique(np.concatenate([[start], indices, [stop]]))
+    return low + indices * fine
+
+def _match(new_axis, old_axis):
+    """Posición de cada valor de `new_axis` en `old_axis` (-1 si no está)."""
+    lookup = {value: i for i, value in enumerate(old_axis.tolist())}
+    return np.array([lookup.get(value, -1) for value in new_axis.tolist()], dtype=np.intp)
+
+def incremental_metric_function(metric_func, parameters, selected_vars, range_inputs, n_points, previous=None):
+    """
+    Versión incremental de `evaluate_metric_function` para 1 o 2 variables, sobre
+    los ejes de `lattice_axis`. `previous` es el estado retornado por la llamada
+    anterior (misma métrica y variables): los valores de los puntos que ya
+    estaban en la malla se copian y solo se evalúan las filas y columnas nuevas,
+    de modo que mover un deslizador cuesta O(n·Δ) en lugar de O(n²).
+    Retorna (superficie, estado, n_evaluaciones), con la superficie en el mismo
+    formato que `evaluate_metric_function`.
+    """
+    axes = [lattice_axis(parameters[var], range_inputs[var], n_points) for var in selected_vars]
+    # En la matriz de valores la primera variable son las columnas (último eje)
+    shape = tuple(len(axis) for axis in reversed(axes))
+    values = np.empty(shape)
+    if previous is None:
+        matches = [np.full(len(axis), -1, dtype=np.intp) for axis in axes]
+    else:
+        matches = [_match(axis, old) for axis, old in zip(axes, previous["axes"])]
+    known = [match >= 0 for match in matches]
+    n_evaluations = 0
+
+    if len(axes) == 1:
+        (x,), (kx,), (mx,) = axes, known, matches
+        if kx.any():
+            values[kx] = previous["values"][mx[kx]]
+        if not kx.all():
+            values[~kx] = evaluate_on_axes(metric_func, parameters, selected_vars, [x[~kx]])
+            n_evaluations = int((~kx).sum())
+        surface = (axes[0], values)
+    else:
+        (x, y), (kx, ky), (mx, my) = axes, known, matches
+        if kx.any() and ky.any():
+            values[np.ix_(ky, kx)] = previous["values"][np.ix_(my[ky], mx[kx])]
+        # Columnas nuevas completas y, en las columnas conocidas, solo las filas nuevas
+        if not kx.all():
+            values[:, ~kx] = evaluate_on_axes(metric_func, parameters, selected_vars, [x[~kx], y])
+            n_evaluations += int((~kx).sum()) * len(y)
+        if kx.any() and not ky.all():
+            values[np.ix_(~ky, kx)] = evaluate_on_axes(metric_func, parameters, selected_vars, [x[kx], y[~ky]])
+            n_evaluations += int(kx.sum()) * int((~ky).sum())
+        X, Y = np.meshgrid(x, y)
+        surface = (X, Y, values)
+    return surface, {"axes": axes, "values": values}, n_evaluations
@@ -0,0 +1,95 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+#############################
+# Instrumentación de los caminos críticos
+#############################
+
+logger = logging.getLogger("quimicai.perf")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Recorder:
+    """Tiempos acumulados (segundos) y contadores con nombre."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.timings = defaultdict(float)
+        self.counters = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.timings[name] += seconds
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def snapshot(self):
+        with self._lock:
+            return {"timings": dict(self.timings), "counters": dict(self.counters),
+                    "elapsed": time.perf_counter() - self.started_at}
+
+
+# Grabador de la re-ejecución en curso (uno por hilo: Streamlit ejecuta cada
+# sesión en su propio hilo) y totales del proceso, que incluyen los trabajos
+# en segundo plano
+_local = threading.local()
+totals = Recorder()
+
+
+def begin_rerun():
+    """Empieza a registrar una re-ejecución del script en el hilo actual."""
+    _local.recorder = Recorder()
+    return _local.recorder
+
+def end_rerun(recorder, **context):
+    """
+    Deja de registrar y escribe una línea de log JSON con el desglose de la
+    re-ejecución (más los campos de `context`). Retorna el resumen.
+    """
+    if getattr(_local, "recorder", None) is recorder:
+        _local.recorder = None
+    summary = {**context, **recorder.snapshot()}
+    logger.info(json.dumps({
+        "event": "rerun",
+        **context,
+        "elapsed_ms": round(summary["elapsed"] * 1e3, 3),
+        "timings_ms": {name: round(seconds * 1e3, 3) for name, seconds in summary["timings"].items()},
+        "counters": summary["counters"],
+    }, ensure_ascii=False, default=str))
+    return summary
+
+def current():
+    return getattr(_local, "recorder", None)
+
+
+@contextmanager
+def timed(name):
+    """Acumula la duración del bloque bajo `name` en la re-ejecución en curso y en los totales."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        recorder = current()
+        if recorder is not None:
+            recorder.add_time(name, elapsed)
+        totals.add_time(name, elapsed)
+
+def count(name, n=1):
+    """Incrementa el contador `name` en la re-ejecución en curso y en los totales."""
+    recorder = current()
+    if recorder is not None:
+        recorder.count(name, n)
+    totals.count(name, n)
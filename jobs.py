@@ -0,0 +1,133 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+#############################
+# Ejecución de trabajos largos en segundo plano
+#############################
+
+PENDING = "pendiente"
+RUNNING = "en curso"
+DONE = "completado"
+FAILED = "error"
+CANCELLED = "cancelado"
+
+
+class JobCancelled(Exception):
+    """Se lanza desde el callback de progreso cuando el trabajo fue cancelado."""
+
+
+class Job:
+    """Estado de un trabajo: progreso, mejor resultado parcial y resultado final."""
+
+    def __init__(self, job_id, description):
+        self.id = job_id
+        self.description = description
+        self.state = PENDING
+        self.progress = 0.0
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.cancel_requested = False
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.lock = threading.Lock()
+
+    def report(self, done, total, partial=None):
+        """Callback de progreso que reciben las funciones lanzadas por `JobRunner`."""
+        with self.lock:
+            if self.cancel_requested:
+                raise JobCancelled(self.id)
+            self.progress = done / total if total else 1.0
+            if partial is not None:
+                self.partial = partial
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "id": self.id,
+                "description": self.description,
+                "state": self.state,
+                "progress": self.progress,
+                "partial": self.partial,
+                "result": self.result,
+                "error": self.error,
+                "elapsed": (self.finished_at or time.time()) - self.submitted_at,
+            }
+
+
+class JobRunner:
+    """
+    Cola de trabajos respaldada por un pool de hilos compartido por todas las
+    sesiones. `submit` retorna un id inmediatamente; la interfaz consulta el
+    estado con `status`. Las funciones lanzadas reciben un argumento `progress`
+    con el que informan de su avance y del mejor resultado parcial.
+    NumPy libera el GIL en las operaciones vectorizadas, así que varios trabajos
+    progresan en paralelo sin bloquear el hilo del script.
+    """
+
+    def __init__(self, max_workers=None, keep_seconds=3600):
+        self.keep_seconds = keep_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                                            thread_name_prefix="quimicai-job")
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, description="", **kwargs):
+        """Encola `fn(*args, progress=..., **kwargs)` y retorna el id del trabajo."""
+        self._purge()
+        with self._lock:
+            job = Job(f"job-{next(self._ids)}", description)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        with job.lock:
+            if job.cancel_requested:
+                job.state, job.finished_at = CANCELLED, time.time()
+                return
+            job.state = RUNNING
+        try:
+            result = fn(*args, progress=job.report, **kwargs)
+        except JobCancelled:
+            state, result, error = CANCELLED, None, None
+        except Exception as exc:  # el error se muestra en la interfaz
+            state, result, error = FAILED, None, f"{type(exc).__name__}: {exc}"
+        else:
+            state, error = DONE, None
+        with job.lock:
+            job.state, job.result, job.error = state, result, error
+            job.progress = 1.0 if state == DONE else job.progress
+            job.finished_at = time.time()
+
+    def status(self, job_id):
+        """Instantánea del estado del trabajo, o None si no existe (o ya se purgó)."""
+        job = self._jobs.get(job_id)
+        return job.snapshot() if job is not None else None
+
+    def cancel(self, job_id):
+        """Solicita la cancelación; surte efecto en el siguiente reporte de progreso."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            with job.lock:
+                job.cancel_requested = True
+
+    def _purge(self):
+        """Olvida los trabajos terminados hace más de `keep_seconds`."""
+        limit = time.time() - self.keep_seconds
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job.finished_at is not None and job.finished_at < limit]:
+                del self._jobs[job_id]
+
+
+def is_finished(status):
+    return status["state"] in (DONE, FAILED, CANCELLED)
+
+
+# Pool único por proceso, compartido por todas las sesiones
+job_runner = JobRunner()
@@ -1,8 +1,48 @@
+import json
+import os
+
 import streamlit as st
+from streamlit.errors import StreamlitAPIException
 import numpy as np
-import time
 import plotly.graph_objects as go
-import plotly.express as px
+
+from adaptive import adaptive_metric_function
+from cache import surface_cache, surface_key
+from evaluation import evaluate_metric_function
+from experiments import default_maximize
+from expressions import FUNCTIONS, ExpressionError, ExpressionMetric, normalize_formula
+from figures import (MAX_SCATTER_POINTS, as_compact_float, compact_surface, continuous_metric_figure, decimate_axis,
+                     uncertainty_figure)
+from instrumentation import begin_rerun, count, end_rerun, timed, totals
+from incremental import incremental_metric_function
+from jobs import DONE, FAILED, is_finished, job_runner
+from store import DEFAULT_POINTS, optimization_key, result_key, result_store
+from sweep import sweep_metric
+from uncertainty import propagate_uncertainty
+
+# optimization, pareto y surrogate dependen de SciPy (~0.5-1 s de importación):
+# se importan dentro de las funciones que los usan, la primera vez que hacen falta.
+
+#############################
+# Arranque: recursos cargados una sola vez por proceso
+#############################
+@st.cache_resource(show_spinner=False)
+def get_registry():
+    """
+    Registro de experimentos definido en `configs/`. Cada experimento se compila
+    la primera vez que se abre su pestaña.
+    """
+    from experiments import EXPERIMENTS
+    return EXPERIMENTS
+
+@st.cache_resource(show_spinner=False)
+def load_static_assets():
+    """Contenido de los archivos estáticos, leído del disco una sola vez."""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "logo.png"), "rb") as f:
+        return {"logo": f.read()}
+
+# Tiempos y contadores de esta re-ejecución (ver el panel de administración al final)
+rerun_recorder = begin_rerun()
 
 # Configuración de la página, logo y eslogan
 st.set_page_config(
@@ -68,7 +108,7 @@ col1, sep, col2 = st.columns([0.15, 0.05, 0.8])
 
 # Column 1: Display the logo
 with col1:
-    st.image("static/logo.png", use_container_width =True)
+    st.image(load_static_assets()["logo"], use_container_width =True)
 
 # Column 2: Display the header content
 with col2:
@@ -90,316 +130,611 @@ with col2:
 # Utilidades y funciones generales
 #############################
 
-def default_value(rng):
-    """Retorna el promedio del rango."""
-    return sum(rng)/2
+def persistent_key(exp_type, key):
+    """
+    Clave del almacén en disco para la clave de caché `key`, o None si el
+    experimento no está en el registro (los modelos sustitutos cambian al
+    añadir mediciones y no se guardan).
+    """
+    registry = get_registry()
+    if exp_type not in registry:
+        return None
+    return result_key(registry.definition(exp_type), *key[1:])
+
+def cache_scope(exp_type, metric_func):
+    """
+    Primer elemento de las claves de caché de la métrica: el experimento y, si
+    es un modelo sustituto, su versión, para que cada sesión con mediciones
+    añadidas tenga sus propias superficies.
+    """
+    version = getattr(getattr(metric_func, "model", None), "version", None)
+    return exp_type if version is None else f"{exp_type}@{version}"
 
-def evaluate_metric_function(metric_func, parameters, selected_vars, range_inputs, n_points):
+def stored_result(exp_type, key, compute):
     """
-    Evalúa la función métrica de forma continua.
-    Si se varía 1 parámetro: retorna vectores (x, y).
-    Si se varían 2 parámetros: retorna matrices (X, Y, Z).
-    Los parámetros no seleccionados se fijan a su valor promedio.
+    Resultado de `compute()` con dos niveles de caché: la de superficies del
+    proceso y, debajo, el almacén en disco compartido por todos los procesos
+    del nodo y que sobrevive a los reinicios.
     """
-    fixed_values = {key: default_value(rng) for key, rng in parameters.items()}
-    if len(selected_vars) == 1:
-        var = selected_vars[0]
-        low, high = range_inputs[var]
-        x = np.linspace(low, high, n_points)
-        y = []
-        for val in x:
-            args = {key: (val if key == var else fixed_values[key]) for key in parameters}
-            y.append(metric_func(**args))
-        return x, np.array(y)
-    elif len(selected_vars) == 2:
-        var1, var2 = selected_vars
-        low1, high1 = range_inputs[var1]
-        low2, high2 = range_inputs[var2]
-        x = np.linspace(low1, high1, n_points)
-        y = np.linspace(low2, high2, n_points)
-        X, Y = np.meshgrid(x, y)
-        Z = np.zeros_like(X)
-        for i in range(n_points):
-            for j in range(n_points):
-                args = {}
-                for key in parameters:
-                    if key == var1:
-                        args[key] = X[i, j]
-                    elif key == var2:
-                        args[key] = Y[i, j]
-                    else:
-                        args[key] = fixed_values[key]
-                Z[i, j] = metric_func(**args)
-        return X, Y, Z
-
-def plot_continuous_metric(selected_vars, range_inputs, n_points, metric_func, display_metric, display_names):
+    store_key = persistent_key(exp_type, key)
+    if store_key is None:
+        return surface_cache.get_or_compute(key, compute)
+    return surface_cache.get_or_compute(key, lambda: result_store.get_or_compute(store_key, compute))
+
+def cached_metric_surface(exp_type, display_metric, metric_func, parameters, selected_vars, range_inputs, n_points,
+                          adaptive=False):
+    """
+    Evalúa la malla de la métrica reutilizando los resultados ya calculados
+    (ver `stored_result`). Con `adaptive=True` usa la malla adaptativa y añade
+    al final el número de evaluaciones.
+    """
+    key = surface_key(cache_scope(exp_type, metric_func), display_metric, selected_vars, range_inputs, n_points)
+    if adaptive:
+        return stored_result(
+            exp_type, key + ("adaptive",),
+            lambda: adaptive_metric_function(metric_func, parameters, selected_vars, range_inputs, n_points))
+    return stored_result(
+        exp_type, key,
+        lambda: evaluate_metric_function(metric_func, parameters, selected_vars, range_inputs, n_points))
+
+def incremental_metric_surface(exp_type, display_metric, metric_func, parameters, selected_vars, range_inputs,
+                               n_points):
+    """
+    Malla incremental: la última malla de la sesión (por experimento) se guarda
+    en `st.session_state` y, mientras no cambien la métrica ni las variables, solo
+    se evalúan los puntos nuevos. Un modelo sustituto ampliado con `append`
+    cambia de versión, lo que descarta la malla guardada.
+    Retorna (superficie, n_evaluaciones, n_puntos).
+    """
+    state_key = f"{exp_type}_incremental"
+    model_version = getattr(getattr(metric_func, "model", None), "version", None)
+    owner = (display_metric, tuple(selected_vars), model_version)
+    last = st.session_state.get(state_key)
+    previous = last["state"] if last is not None and last["owner"] == owner else None
+    surface, state, n_evaluations = incremental_metric_function(metric_func, parameters, selected_vars,
+                                                                range_inputs, n_points, previous)
+    st.session_state[state_key] = {"owner": owner, "state": state}
+    return surface, n_evaluations, state["values"].size
+
+def plot_uncertainty(exp_type, parameters, selected_vars, range_inputs, n_points, metric_func, display_metric,
+                     display_names, uncertainty):
+    """
+    Respuesta de la métrica con las entradas inciertas (ver `choose_uncertainty`):
+    bandas de confianza en 1D y superficie de desviación estándar en 2D. El
+    resultado se guarda (`stored_result`) para cada configuración.
+    """
+    key = surface_key(cache_scope(exp_type, metric_func), display_metric, selected_vars, range_inputs,
+                      n_points) + (
+        "uncertainty", uncertainty["distribution"], uncertainty["n_draws"],
+        tuple(sorted(uncertainty["tolerances"].items())))
+    with timed(f"{exp_type}/evaluate"), st.spinner("Propagando la incertidumbre..."):
+        result = stored_result(exp_type, key, lambda: propagate_uncertainty(
+            metric_func, parameters, selected_vars, range_inputs, n_points, uncertainty["tolerances"],
+            distribution=uncertainty["distribution"], n_draws=uncertainty["n_draws"]))
+    std = result[-3]
+    st.caption(f"Monte Carlo con {uncertainty['n_draws']:,} extracciones por punto "
+               f"({uncertainty['n_draws'] * std.size:,} evaluaciones); σ máxima: {std.max():.4g}.")
+    with timed(f"{exp_type}/figure"):
+        fig = uncertainty_figure(result, selected_vars, display_metric, display_names)
+    with timed(f"{exp_type}/emit"):
+        st.plotly_chart(fig, use_container_width=True)
+
+def plot_continuous_metric(exp_type, parameters, selected_vars, range_inputs, n_points, metric_func, display_metric,
+                           display_names, grid="uniform", uncertainty=None):
     """
     Genera la visualización interactiva de la función continua:
       - Curva suave en 2D (si se selecciona 1 variable).
       - Superficie en 3D (si se seleccionan 2 variables).
+    `grid` elige la malla:
+      - "uniform": `n_points` equiespaciados por eje, con caché compartida.
+      - "incremental": retícula común en la que, al mover un deslizador, solo se
+        evalúan las franjas nuevas.
+      - "adaptive": se refina solo donde la métrica se curva.
+    En las dos últimas se informa del número de evaluaciones. Con `uncertainty`
+    se muestra en su lugar la propagación de incertidumbre (malla uniforme).
     """
-    if len(selected_vars) == 1:
-        x, y = evaluate_metric_function(metric_func, current_parameters, selected_vars, range_inputs, n_points)
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=x, y=y, mode='markers', name='Datos calculados'))
-        fig.add_trace(go.Scatter(x=x, y=y, mode='lines', name='Curva continua'))
-        fig.update_layout(title=f"{display_metric} vs {display_names[selected_vars[0]]}",
-                          xaxis_title=display_names[selected_vars[0]],
-                          yaxis_title=display_metric)
-        st.plotly_chart(fig, use_container_width=True)
-    elif len(selected_vars) == 2:
-        X, Y, Z = evaluate_metric_function(metric_func, current_parameters, selected_vars, range_inputs, n_points)
-        fig = go.Figure(data=[go.Surface(x=X, y=Y, z=Z, colorscale='Viridis')])
-        fig.update_layout(title=f"{display_metric} en función de {display_names[selected_vars[0]]} y {display_names[selected_vars[1]]}",
-                          scene=dict(
-                              xaxis_title=display_names[selected_vars[0]],
-                              yaxis_title=display_names[selected_vars[1]],
-                              zaxis_title=display_metric))
-        st.plotly_chart(fig, use_container_width=True)
-    else:
+    if len(selected_vars) not in (1, 2):
         st.warning("Por favor, selecciona 1 o 2 variables para visualizar la función continua.")
+        return
+    if uncertainty is not None:
+        plot_uncertainty(exp_type, parameters, selected_vars, range_inputs, n_points, metric_func, display_metric,
+                         display_names, uncertainty)
+        return
+    with timed(f"{exp_type}/evaluate"):
+        if grid == "incremental":
+            surface, n_evaluations, n_grid = incremental_metric_surface(
+                exp_type, display_metric, metric_func, parameters, selected_vars, range_inputs, n_points)
+        else:
+            surface = cached_metric_surface(exp_type, display_metric, metric_func, parameters,
+                                            selected_vars, range_inputs, n_points, grid == "adaptive")
+    if grid == "adaptive":
+        *surface, n_evaluations = surface
+        uniform = n_points**len(selected_vars)
+        st.caption(f"Malla adaptativa: {n_evaluations} evaluaciones frente a {uniform} de la malla uniforme "
+                   f"({1 - n_evaluations / uniform:.0%} de ahorro).")
+    elif grid == "incremental":
+        st.caption(f"Malla incremental: {n_evaluations} puntos nuevos evaluados; "
+                   f"{n_grid - n_evaluations} de {n_grid} reutilizados de la malla anterior.")
+    with timed(f"{exp_type}/figure"):
+        surface, payload = compact_surface(surface)
+        fig = continuous_metric_figure(surface, selected_vars, display_metric, display_names)
+    count("payload_bytes", payload["compact_bytes"])
+    count("payload_bytes_saved", payload["saved_bytes"])
+    with timed(f"{exp_type}/emit"):
+        st.plotly_chart(fig, use_container_width=True)
 
-def simulate_optimization(metric_func, parameters, range_inputs, selected_vars, n_points, exp_type):
-    """Simula la optimización (código confidencial) y calcula métricas de ahorro."""
-    with st.spinner("Optimizando parámetros..."):
-        time.sleep(10)  # Simulación de proceso intensivo
-    st.success("Optimización completada. (Código confidencial, no disponible)")
+def admin_enabled():
+    """
+    El panel de rendimiento se muestra con la variable QUIMICAI_ADMIN=1 o con
+    `quimicai_admin = true` en los secretos de Streamlit; los visitantes no
+    pueden activarlo desde la URL.
+    """
+    if os.environ.get("QUIMICAI_ADMIN") == "1":
+        return True
+    try:
+        return st.secrets.get("quimicai_admin") is True
+    except FileNotFoundError:
+        # Sin archivo secrets.toml
+        return False
+
+def show_admin_panel(summary):
+    """Desglose de tiempos y contadores de la re-ejecución, totales del proceso y estado de la caché."""
+    with st.sidebar.expander("Rendimiento (administración)", expanded=True):
+        st.metric("Re-ejecución", f"{summary['elapsed'] * 1e3:.1f} ms")
+        timings = sorted(summary["timings"].items(), key=lambda item: -item[1])
+        st.table({
+            "Etapa": [name for name, _ in timings],
+            "ms": [f"{seconds * 1e3:.2f}" for _, seconds in timings]
+        })
+        counters = summary["counters"]
+        st.caption(f"{counters.get('metric_calls', 0)} llamadas a métricas, "
+                   f"{counters.get('points_evaluated', 0):,} puntos evaluados en esta re-ejecución. "
+                   f"Datos de gráficos: {counters.get('payload_bytes', 0):,} bytes enviados, "
+                   f"{counters.get('payload_bytes_saved', 0):,} bytes ahorrados.")
+        process = totals.snapshot()
+        st.caption(f"Proceso: {process['counters'].get('metric_calls', 0)} llamadas, "
+                   f"{process['counters'].get('points_evaluated', 0):,} puntos. "
+                   f"Caché de superficies: {surface_cache.stats()}")
+        st.caption(f"Almacén en disco: {result_store.stats()}")
+
+def show_background_job(job_key, describe_partial, render_result):
+    """
+    Muestra el trabajo en segundo plano guardado en la sesión bajo `job_key`.
+    Mientras está en curso, el panel se consulta cada medio segundo (solo se
+    re-ejecuta el fragmento, no la página) mostrando el progreso y el resultado
+    parcial descrito por `describe_partial(partial)`; al terminar se muestra con
+    `render_result(result)`.
+    """
+    job = st.session_state.get(job_key)
+    if job is None:
+        return
+    status = job_runner.status(job["id"])
+    if status is None:
+        del st.session_state[job_key]
+        return
+    running = not is_finished(status)
+
+    def panel():
+        status = job_runner.status(job["id"])
+        if running and is_finished(status):
+            st.rerun()  # detiene el sondeo y muestra el resultado final
+        if not is_finished(status):
+            text = f"{job['label']}... {status['progress']:.0%}"
+            if status["partial"] is not None:
+                text += f" · {describe_partial(status['partial'])}"
+            st.progress(status["progress"], text=text)
+            if st.button("Cancelar", key=f"{job_key}_cancel"):
+                job_runner.cancel(job["id"])
+        elif status["state"] == DONE:
+            render_result(status["result"])
+        elif status["state"] == FAILED:
+            st.error(f"{job['label']} falló: {status['error']}")
+        else:
+            st.info(f"{job['label']}: cancelado.")
+
+    st.fragment(panel, run_every=0.5 if running else None)()
+
+def stored_optimization(store_key, metric_func, parameters, maximize, progress=None):
+    """`optimize_metric` a través del almacén en disco (si `store_key` no es None)."""
+    def compute():
+        from optimization import optimize_metric
+        return optimize_metric(metric_func, parameters, maximize=maximize, progress=progress)
+
+    if store_key is None:
+        return compute()
+    return result_store.get_or_compute(store_key, compute)
+
+def start_optimization(exp_type, metric_func, parameters, display_metric, maximize):
+    """
+    Encola la optimización en el pool de trabajos y guarda su id en la sesión.
+    Si ya se calculó (en cualquier proceso del nodo), el trabajo solo la lee del almacén.
+    """
+    registry = get_registry()
+    store_key = (optimization_key(registry.definition(exp_type), display_metric, maximize)
+                 if exp_type in registry else None)
+    previous = st.session_state.get(f"{exp_type}_job")
+    if previous is not None:
+        # Un solo trabajo por sesión: el anterior dejaría de mostrarse pero seguiría ocupando el pool
+        job_runner.cancel(previous["id"])
+    job_id = job_runner.submit(stored_optimization, store_key, metric_func, parameters, maximize,
+                               description=f"{exp_type}: {display_metric}")
+    st.session_state[f"{exp_type}_job"] = {"id": job_id, "label": f"Optimizando {display_metric}",
+                                           "metric": display_metric}
+
+def show_optimization_job(exp_type, parameters, display_names, metric_functions, range_inputs,
+                          selected_vars, n_points, time_saved):
+    """Progreso, mejor resultado parcial y resultado final de la optimización de la sesión."""
+    job = st.session_state.get(f"{exp_type}_job")
+    if job is None:
+        return
+    if job["metric"] not in metric_functions:
+        # Métrica personalizada quitada mientras se optimizaba o se mostraba su resultado
+        job_runner.cancel(job["id"])
+        del st.session_state[f"{exp_type}_job"]
+        st.info(f"La métrica '{job['metric']}' ya no existe; se descartó su optimización.")
+        return
+    show_background_job(
+        f"{exp_type}_job",
+        lambda partial: f"mejor hasta ahora: {partial['value']:.6g}",
+        lambda result: show_optimization_result(result, exp_type, job["metric"], metric_functions[job["metric"]],
+                                                parameters, display_names, range_inputs, selected_vars, n_points,
+                                                time_saved))
+
+def show_optimization_result(result, exp_type, display_metric, metric_func, parameters, display_names,
+                             range_inputs, selected_vars, n_points, time_saved):
+    """Muestra el óptimo encontrado y calcula métricas de ahorro."""
+    st.success(f"Optimización completada: {display_metric} = {result['value']:.6g} "
+               f"({result['n_evaluations']} evaluaciones)")
+    st.table({
+        "Parámetro": [display_names[key] for key in result["x"]],
+        "Valor óptimo": [f"{val:.4g}" for val in result["x"].values()]
+    })
     # Evaluar la función en la malla y calcular el rango de la métrica
     if len(selected_vars) == 1:
-        x, y = evaluate_metric_function(metric_func, parameters, selected_vars, range_inputs, n_points)
+        x, y = cached_metric_surface(exp_type, display_metric, metric_func, parameters,
+                                     selected_vars, range_inputs, n_points)
         value_range = y.max() - y.min()
     elif len(selected_vars) == 2:
-        X, Y, Z = evaluate_metric_function(metric_func, parameters, selected_vars, range_inputs, n_points)
+        X, Y, Z = cached_metric_surface(exp_type, display_metric, metric_func, parameters,
+                                        selected_vars, range_inputs, n_points)
         value_range = Z.max() - Z.min()
     else:
         value_range = 0
-    # Valores ficticios de ahorro (para demostración)
-    if exp_type == 'chem':
-        time_saved = "72 horas"
-    elif exp_type == 'mat':
-        time_saved = "48 horas"
-    elif exp_type == 'bio':
-        time_saved = "60 horas"
-    money_saved = f"{value_range*0.001:.2f} €"  # Factor de escala arbitrario
-    st.metric("Ahorro en dinero", money_saved, delta=f"-{money_saved} comparado con pruebas reales")
+    # Valores ficticios de ahorro (para demostración); el de tiempo viene de la definición
+    if np.isfinite(value_range):
+        money_saved = f"{value_range*0.001:.2f} €"  # Factor de escala arbitrario
+        st.metric("Ahorro en dinero", money_saved, delta=f"-{money_saved} comparado con pruebas reales")
+    else:
+        st.warning("La métrica toma valores no finitos (infinito o indefinido) en la malla mostrada; "
+                   "no se puede estimar el ahorro en dinero.")
     st.metric("Ahorro en tiempo", time_saved)
 
-#############################
-# FUNCIONES CONTINUAS CON BASE GAUSSIANA
-#############################
-
-# --- Ejemplo: Reacción Química (Polimerización de Etileno) ---
-chem_parameters = {
-    "TiCl3": (0.05, 0.5),
-    "Al_Ti": (3, 13),
-    "Temp": (60, 110),
-    "Presion": (1, 20)
-}
-chem_display_names = {
-    "TiCl3": "Concentración de TiCl3 (mol/L)",
-    "Al_Ti": "Relación Al/Ti (mol/mol)",
-    "Temp": "Temperatura (°C)",
-    "Presion": "Presión (atm)"
-}
-
-# Constantes globales para el modelo Arrhenius
-R = 8.314  # Constante de gases en J/(mol*K)
-Ea = 50000  # Energía de activación (J/mol) - valor de ejemplo
-A0 = 1e6    # Factor pre-exponencial base (1/s) - valor de ejemplo
-
-def chem_constante_k(TiCl3, Al_Ti, Temp, Presion):
-    """
-    Calcula la constante cinética k(T) asumiendo un comportamiento Arrhenius
-    y que las desviaciones de TiCl3, Al_Ti y Presion modulan ligeramente el valor de A.
-    Temp se asume en °C, por lo que se convierte a K.
-    """
-
-    # Convertimos la temperatura a Kelvin
-    T_kelvin = Temp + 273.15
-    
-    # --- Ajuste del factor pre-exponencial (A) según desviaciones de parámetros ---
-    # Supongamos que, además de la temperatura, la cantidad de catalizador y la
-    # relación Al/Ti pueden afectar el "A efectivo". Mantenemos la idea de un factor
-    # exponencial que penalice la desviación de valores óptimos.
-    
-    opt = {"TiCl3": 0.3, "Al_Ti": 9, "Presion": 10}
-    sigma = {"TiCl3": 0.1, "Al_Ti": 1.5, "Presion": 3}
-    
-    # Cálculo de la "penalización" (o modulación) basado en los otros parámetros
-    term = ((TiCl3 - opt["TiCl3"]) / sigma["TiCl3"])**2 \
-         + ((Al_Ti - opt["Al_Ti"])   / sigma["Al_Ti"])**2 \
-         + ((Presion - opt["Presion"]) / sigma["Presion"])**2
-
-    # Factor multiplicativo para A en función de la desviación
-    # (cuanto mayor sea 'term', menor será el factor)
-    modulation_factor = np.exp(-0.5 * term)
-    
-    # Factor pre-exponencial "ajustado"
-    A_eff = A0 * modulation_factor
-    
-    # --- Ecuación de Arrhenius ---
-    k = A_eff * np.exp(-Ea / (R * T_kelvin))
-    
-    return k
-
-
-def chem_velocidad_polimerizacion(TiCl3, Al_Ti, Temp, Presion):
+def start_sweep(exp_type, metric_func, parameters, display_metric, n_points):
+    """Encola el barrido factorial completo en el pool de trabajos."""
+    previous = st.session_state.get(f"{exp_type}_sweep_job")
+    if previous is not None:
+        job_runner.cancel(previous["id"])
+    job_id = job_runner.submit(sweep_metric, metric_func, parameters, n_points,
+                               description=f"{exp_type}: barrido {display_metric}")
+    st.session_state[f"{exp_type}_sweep_job"] = {"id": job_id, "label": f"Barriendo {display_metric}",
+                                                 "metric": display_metric}
+
+def show_sweep_result(result, display_metric, display_names):
+    """Resumen de un barrido completo: extremos, histograma y medias marginales por eje."""
+    st.success(f"Barrido completado: {result['n_evaluations']:,} puntos evaluados.")
+    if result["n_nonfinite"]:
+        st.warning(f"{result['n_nonfinite']:,} puntos con valor no finito (infinito o indefinido) se excluyeron "
+                   "de las estadísticas, el histograma y las medias marginales.")
+    col_min, col_max, col_mean = st.columns(3)
+    col_min.metric("Mínimo", f"{result['min']:.6g}")
+    col_max.metric("Máximo", f"{result['max']:.6g}")
+    col_mean.metric("Media ± desviación", f"{result['mean']:.4g} ± {result['std']:.2g}")
+    st.table({
+        "Parámetro": [display_names[key] for key in result["argmax"]],
+        "En el máximo": [f"{val:.4g}" for val in result["argmax"].values()],
+        "En el mínimo": [f"{val:.4g}" for val in result["argmin"].values()]
+    })
+    counts, edges = result["histogram"]
+    fig = go.Figure(data=[go.Bar(x=0.5 * (edges[:-1] + edges[1:]), y=counts, width=np.diff(edges))])
+    fig.update_layout(title=f"Distribución de {display_metric} en todo el espacio",
+                      xaxis_title=display_metric, yaxis_title="Número de puntos")
+    st.plotly_chart(fig, use_container_width=True)
+    fig = go.Figure()
+    for key, (axis, means) in result["marginal_means"].items():
+        # Eje normalizado a [0, 1] para comparar en una sola gráfica parámetros con unidades distintas
+        fig.add_trace(go.Scatter(x=(axis - axis[0]) / ((axis[-1] - axis[0]) or 1), y=means, mode='lines',
+                                 name=display_names[key], customdata=axis,
+                                 hovertemplate="%{customdata:.4g}: %{y:.4g}"))
+    fig.update_layout(title=f"Media marginal de {display_metric} a lo largo de cada parámetro",
+                      xaxis_title="Posición relativa en el rango del parámetro", yaxis_title=display_metric)
+    st.plotly_chart(fig, use_container_width=True)
+
+def show_full_sweep(exp_type, parameters, display_names, metric_func, display_metric):
+    """Barrido factorial de todas las variables, lanzado como trabajo en segundo plano."""
+    n_points = st.slider("Puntos por eje", 2, 100, 20, key=f"{exp_type}_sweep_points")
+    st.caption(f"{n_points**len(parameters):,} puntos en total; se evalúan por bloques con memoria acotada.")
+    if st.button("Lanzar barrido completo", key=f"{exp_type}_sweep_button"):
+        start_sweep(exp_type, metric_func, parameters, display_metric, n_points)
+    job = st.session_state.get(f"{exp_type}_sweep_job")
+    if job is not None:
+        show_background_job(
+            f"{exp_type}_sweep_job",
+            lambda partial: f"{partial['evaluated']:,} puntos, máximo hasta ahora: {partial['max']:.6g}",
+            lambda result: show_sweep_result(result, job["metric"], display_names))
+
+def start_sensitivity(exp_type, metric_functions, parameters, method, n_samples):
+    """Encola el análisis de sensibilidad (todas las métricas a la vez) en el pool de trabajos."""
+    from sensitivity import morris_screening, sobol_indices
+    previous = st.session_state.get(f"{exp_type}_sensitivity_job")
+    if previous is not None:
+        job_runner.cancel(previous["id"])
+    if method == "Sobol":
+        job_id = job_runner.submit(sobol_indices, metric_functions, parameters, n_samples=n_samples,
+                                   description=f"{exp_type}: Sobol")
+    else:
+        job_id = job_runner.submit(morris_screening, metric_functions, parameters, n_trajectories=n_samples,
+                                   description=f"{exp_type}: Morris")
+    st.session_state[f"{exp_type}_sensitivity_job"] = {"id": job_id, "label": f"Análisis de sensibilidad ({method})",
+                                                       "method": method}
+
+def show_sensitivity_result(result, method, display_metric, display_names):
+    """Índices de la métrica seleccionada y mapa de calor con todas las métricas."""
+    labels = [display_names[key] for key in result["parameters"]]
+    st.success(f"Análisis completado: {result['n_evaluations']:,} evaluaciones.")
+    # Una métrica personalizada añadida después del análisis no tiene índices propios
+    k = result["metrics"].index(display_metric) if display_metric in result["metrics"] else None
+    if k is None:
+        st.info(f"'{display_metric}' no formaba parte de este análisis; vuelve a calcularlo para ver sus índices.")
+    if method == "Sobol":
+        if k is not None:
+            fig = go.Figure(data=[go.Bar(x=labels, y=result["first"][k], name="Primer orden (S1)"),
+                                  go.Bar(x=labels, y=result["total"][k], name="Total (ST)")])
+            fig.update_layout(barmode="group", title=f"Índices de Sobol de {display_metric}", yaxis_title="Índice")
+            st.plotly_chart(fig, use_container_width=True)
+            st.caption("S1: fracción de la varianza debida a cada parámetro por sí solo; ST: incluyendo sus "
+                       "interacciones. ST - S1 grande indica interacciones fuertes.")
+        heat, heat_title = result["total"], "Índice total de Sobol (ST) por métrica"
+    else:
+        if k is not None:
+            fig = go.Figure(data=[go.Scatter(x=result["mu_star"][k], y=result["sigma"][k], mode="markers+text",
+                                             text=labels, textposition="top center")])
+            fig.update_layout(title=f"Cribado de Morris de {display_metric}",
+                              xaxis_title="μ* (importancia)", yaxis_title="σ (no linealidad / interacciones)")
+            st.plotly_chart(fig, use_container_width=True)
+        # Normalizado por métrica para comparar en un solo mapa métricas con unidades distintas
+        heat = result["mu_star"] / np.maximum(result["mu_star"].max(axis=1, keepdims=True), 1e-300)
+        heat_title = "μ* relativo al parámetro más influyente de cada métrica"
+    fig = go.Figure(data=[go.Heatmap(z=heat, x=labels, y=result["metrics"], colorscale="Viridis", zmin=0)])
+    fig.update_layout(title=heat_title)
+    st.plotly_chart(fig, use_container_width=True)
+
+def show_sensitivity(exp_type, parameters, display_names, metric_functions, display_metric):
     """
-    Calcula la velocidad de polimerización r = k(T) * [monómero].
-    Aquí usamos la presión como proxy de la concentración del monómero.
+    Análisis de sensibilidad global sobre toda la caja de parámetros (en lugar
+    de fijar los no seleccionados en el punto medio), lanzado en segundo plano.
     """
-    # Obtenemos la constante cinética con la función anterior
-    k_val = chem_constante_k(TiCl3, Al_Ti, Temp, Presion)
-    
-    # Usamos la presión como concentración (muy simplificado)
-    # Podrías añadir factores de conversión o usar una fracción de la presión total.
-    monomero_conc = Presion  # Proxy simple: [monómero] ~ Presión (atm)
-    
-    # Velocidad de reacción
-    r = k_val * monomero_conc
-    return r
-
-def chem_peso_molecular(TiCl3, Al_Ti, Temp, Presion):
-    base = 2800000
-    gain = 3100000
-    # Parámetros óptimos y desviaciones estándar
-    opt = {"TiCl3": 0.3, "Al_Ti": 9, "Temp": 90, "Presion": 10}
-    sigma = {"TiCl3": 0.1, "Al_Ti": 1.5, "Temp": 10, "Presion": 3}
-    term = ((TiCl3 - opt["TiCl3"])/sigma["TiCl3"])**2 + ((Al_Ti - opt["Al_Ti"])/sigma["Al_Ti"])**2 \
-           + ((Temp - opt["Temp"])/sigma["Temp"])**2 + ((Presion - opt["Presion"])/sigma["Presion"])**2
-    return base + gain * np.exp(-0.5*term)
-
-def chem_rendimiento(TiCl3, Al_Ti, Temp, Presion):
-    base = 60
-    gain = 35
-    opt = {"TiCl3": 0.3, "Al_Ti": 9, "Temp": 90, "Presion": 10}
-    sigma = {"TiCl3": 0.1, "Al_Ti": 1.5, "Temp": 10, "Presion": 3}
-    term = ((TiCl3 - opt["TiCl3"])/sigma["TiCl3"])**2 + ((Al_Ti - opt["Al_Ti"])/sigma["Al_Ti"])**2 \
-           + ((Temp - opt["Temp"])/sigma["Temp"])**2 + ((Presion - opt["Presion"])/sigma["Presion"])**2
-    return base + gain * np.exp(-0.5*term)
-
-def chem_costo(TiCl3, Al_Ti, Temp, Presion):
-    base = 5000
-    reduction = 2000
-    opt = {"TiCl3": 0.3, "Al_Ti": 9, "Temp": 90, "Presion": 10}
-    sigma = {"TiCl3": 0.1, "Al_Ti": 1.5, "Temp": 10, "Presion": 3}
-    term = ((TiCl3 - opt["TiCl3"])/sigma["TiCl3"])**2 + ((Al_Ti - opt["Al_Ti"])/sigma["Al_Ti"])**2 \
-           + ((Temp - opt["Temp"])/sigma["Temp"])**2 + ((Presion - opt["Presion"])/sigma["Presion"])**2
-    return base - reduction * np.exp(-0.5*term)
-
-chem_metric_functions = {
-    "Constante Cinética": chem_constante_k,
-    "Velocidad de Polimerización": chem_velocidad_polimerizacion,
-    "Peso molecular (g/mol)": chem_peso_molecular,
-    "Rendimiento (%)": chem_rendimiento,
-    "Costo (€)": chem_costo
-}
-
-# --- Ejemplo: Ingeniería de Materiales (Superaleaciones de Níquel) ---
-material_parameters = {
-    "Ni": (60, 78),
-    "Cr": (10, 16),
-    "Temp": (1100, 1200),
-    "Tiempo": (2, 8)
-}
-material_display_names = {
-    "Ni": "Porcentaje de Ni (%)",
-    "Cr": "Porcentaje de Cr (%)",
-    "Temp": "Temperatura de Solubilización (°C)",
-    "Tiempo": "Tiempo de Envejecimiento (h)"
-}
-def material_resistencia(Ni, Cr, Temp, Tiempo):
-    base = 550
-    gain = 250
-    opt = {"Ni": 72, "Cr": 13, "Temp": 1150, "Tiempo": 5}
-    sigma = {"Ni": 3, "Cr": 2, "Temp": 25, "Tiempo": 1.5}
-    term = ((Ni - opt["Ni"])/sigma["Ni"])**2 + ((Cr - opt["Cr"])/sigma["Cr"])**2 \
-           + ((Temp - opt["Temp"])/sigma["Temp"])**2 + ((Tiempo - opt["Tiempo"])/sigma["Tiempo"])**2
-    return base + gain * np.exp(-0.5*term)
-
-def material_ductilidad(Ni, Cr, Temp, Tiempo):
-    base = 15
-    gain = 5
-    opt = {"Ni": 68, "Cr": 12, "Temp": 1130, "Tiempo": 4}
-    sigma = {"Ni": 4, "Cr": 2, "Temp": 30, "Tiempo": 1.5}
-    term = ((Ni - opt["Ni"])/sigma["Ni"])**2 + ((Cr - opt["Cr"])/sigma["Cr"])**2 \
-           + ((Temp - opt["Temp"])/sigma["Temp"])**2 + ((Tiempo - opt["Tiempo"])/sigma["Tiempo"])**2
-    return base + gain * np.exp(-0.5*term)
-
-def material_costo(Ni, Cr, Temp, Tiempo):
-    base = 10000
-    reduction = 3000
-    opt = {"Ni": 72, "Cr": 13, "Temp": 1150, "Tiempo": 5}
-    sigma = {"Ni": 3, "Cr": 2, "Temp": 25, "Tiempo": 1.5}
-    term = ((Ni - opt["Ni"])/sigma["Ni"])**2 + ((Cr - opt["Cr"])/sigma["Cr"])**2 \
-           + ((Temp - opt["Temp"])/sigma["Temp"])**2 + ((Tiempo - opt["Tiempo"])/sigma["Tiempo"])**2
-    return base - reduction * np.exp(-0.5*term)
-
-material_metric_functions = {
-    "Resistencia a Fluencia (MPa)": material_resistencia,
-    "Ductilidad (%)": material_ductilidad,
-    "Costo (€)": material_costo
-}
-
-# --- Ejemplo: Materiales Biológicos (Producción de Anticuerpos Monoclonales) ---
-bio_parameters = {
-    "Glucosa": (2, 10),
-    "pH": (6.8, 7.4),
-    "Agitacion": (100, 250),
-    "Estrategia": (0, 1)  # Se trata como continua: 0 = batch, 1 = perfusión
-}
-bio_display_names = {
-    "Glucosa": "Concentración de Glucosa (g/L)",
-    "pH": "pH",
-    "Agitacion": "Velocidad de Agitación (rpm)",
-    "Estrategia": "Estrategia de Alimentación (0=batch, 1=perfusión)"
-}
-def bio_productividad(Glucosa, pH, Agitacion, Estrategia):
-    base = 1.0
-    gain = 2.0
-    opt = {"Glucosa": 6, "pH": 7.1, "Agitacion": 200, "Estrategia": 1}
-    sigma = {"Glucosa": 1.5, "pH": 0.2, "Agitacion": 30, "Estrategia": 0.1}
-    term = ((Glucosa - opt["Glucosa"])/sigma["Glucosa"])**2 + ((pH - opt["pH"])/sigma["pH"])**2 \
-           + ((Agitacion - opt["Agitacion"])/sigma["Agitacion"])**2 + ((Estrategia - opt["Estrategia"])/sigma["Estrategia"])**2
-    return base + gain * np.exp(-0.5*term)
-
-def bio_calidad(Glucosa, pH, Agitacion, Estrategia):
-    base = 90
-    gain = 10
-    opt = {"Glucosa": 6, "pH": 7.1, "Agitacion": 200, "Estrategia": 1}
-    sigma = {"Glucosa": 1.5, "pH": 0.2, "Agitacion": 30, "Estrategia": 0.1}
-    term = ((Glucosa - opt["Glucosa"])/sigma["Glucosa"])**2 + ((pH - opt["pH"])/sigma["pH"])**2 \
-           + ((Agitacion - opt["Agitacion"])/sigma["Agitacion"])**2 + ((Estrategia - opt["Estrategia"])/sigma["Estrategia"])**2
-    return base + gain * np.exp(-0.5*term)
-
-def bio_costo(Glucosa, pH, Agitacion, Estrategia):
-    base = 7500
-    reduction = 1500
-    opt = {"Glucosa": 6, "pH": 7.1, "Agitacion": 200, "Estrategia": 1}
-    sigma = {"Glucosa": 1.5, "pH": 0.2, "Agitacion": 30, "Estrategia": 0.1}
-    term = ((Glucosa - opt["Glucosa"])/sigma["Glucosa"])**2 + ((pH - opt["pH"])/sigma["pH"])**2 \
-           + ((Agitacion - opt["Agitacion"])/sigma["Agitacion"])**2 + ((Estrategia - opt["Estrategia"])/sigma["Estrategia"])**2
-    return base - reduction * np.exp(-0.5*term)
-
-bio_metric_functions = {
-    "Productividad (g/L)": bio_productividad,
-    "Calidad (% mAb funcional)": bio_calidad,
-    "Costo (€)": bio_costo
-}
-
-#############################
-# Mapas para mostrar opciones en la interfaz
-#############################
-chem_display_to_key = {v: k for k, v in chem_display_names.items()}
-material_display_to_key = {v: k for k, v in material_display_names.items()}
-bio_display_to_key = {v: k for k, v in bio_display_names.items()}
+    method = st.radio("Método", ["Sobol", "Morris"], horizontal=True, key=f"{exp_type}_sensitivity_method")
+    if method == "Sobol":
+        n_samples = st.select_slider("Muestras base", options=[2**k for k in range(10, 19)], value=2**14,
+                                     key=f"{exp_type}_sensitivity_samples")
+        st.caption(f"{n_samples * (len(parameters) + 2):,} evaluaciones por métrica.")
+    else:
+        n_samples = st.select_slider("Trayectorias", options=[2**k for k in range(6, 15)], value=2**9,
+                                     key=f"{exp_type}_sensitivity_trajectories")
+        st.caption(f"{n_samples * (len(parameters) + 1):,} evaluaciones por métrica.")
+    if st.button("Calcular sensibilidad", key=f"{exp_type}_sensitivity_button"):
+        start_sensitivity(exp_type, metric_functions, parameters, method, n_samples)
+    job = st.session_state.get(f"{exp_type}_sensitivity_job")
+    if job is not None:
+        show_background_job(
+            f"{exp_type}_sensitivity_job",
+            lambda partial: f"último parámetro: {partial['parameter']}",
+            lambda result: show_sensitivity_result(result, job["method"], display_metric, display_names))
+
+def show_pareto_front(exp_type, parameters, display_names, metric_functions):
+    """
+    Frente de Pareto entre 2 o 3 métricas. Todas las métricas del experimento se
+    evalúan una sola vez sobre una muestra común de la caja de parámetros; la
+    muestra se guarda con `stored_result` y el frente en la caché de superficies.
+    """
+    from pareto import pareto_indices, sample_metrics
+    metric_names = list(metric_functions)
+    selected = st.multiselect("Métricas a comparar (2 o 3)", metric_names, default=metric_names[:2],
+                              max_selections=3, key=f"{exp_type}_pareto_metrics")
+    n_samples = st.select_slider("Número de candidatos", options=[2**k for k in range(10, 18)],
+                                 value=2**14, key=f"{exp_type}_pareto_samples")
+    if len(selected) < 2:
+        st.info("Selecciona al menos 2 métricas para calcular el frente de Pareto.")
+        return
+    scope = cache_scope(exp_type, next(iter(metric_functions.values())))
+    points, values = stored_result(
+        exp_type, (scope, "pareto_samples", n_samples, tuple(metric_names)),
+        lambda: sample_metrics(metric_functions, parameters, n_samples))
+    columns = [metric_names.index(name) for name in selected]
+    maximize = [default_maximize(name) for name in selected]
+    front = surface_cache.get_or_compute(
+        (scope, "pareto_front", n_samples, tuple(selected)),
+        lambda: pareto_indices(values[:, columns], maximize))
+    front = front[np.argsort(values[front, columns[0]])]
+    # Con métricas que no compiten entre sí el frente puede contener todos los candidatos
+    shown = front[decimate_axis(len(front), MAX_SCATTER_POINTS)]
+    coords = [as_compact_float(values[shown, column]) for column in columns]
+
+    hover = "<br>".join(f"{display_names[key]}: %{{customdata[{i}]:.4g}}" for i, key in enumerate(parameters))
+    if len(selected) == 2:
+        background = decimate_axis(len(values), MAX_SCATTER_POINTS)
+        fig = go.Figure()
+        fig.add_trace(go.Scattergl(x=as_compact_float(values[background, columns[0]]),
+                                   y=as_compact_float(values[background, columns[1]]),
+                                   mode='markers', name='Candidatos',
+                                   marker=dict(size=3, color='lightgray')))
+        fig.add_trace(go.Scattergl(x=coords[0], y=coords[1], mode='lines+markers', name='Frente de Pareto',
+                                   customdata=points[shown], hovertemplate=hover))
+        fig.update_layout(xaxis_title=selected[0], yaxis_title=selected[1])
+    else:
+        fig = go.Figure(data=[go.Scatter3d(x=coords[0], y=coords[1], z=coords[2], mode='markers',
+                                           marker=dict(size=3, color=coords[2], colorscale='Viridis'),
+                                           customdata=points[shown], hovertemplate=hover)])
+        fig.update_layout(scene=dict(xaxis_title=selected[0], yaxis_title=selected[1],
+                                     zaxis_title=selected[2]))
+    goals = ", ".join(f"{'max' if m else 'min'} {name}" for name, m in zip(selected, maximize))
+    fig.update_layout(title=f"Frente de Pareto ({goals})")
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"{len(front)} soluciones no dominadas entre {len(values)} candidatos"
+               + (f" (se muestran {len(shown)})." if len(shown) < len(front) else "."))
 
 #############################
 # Widget personalizado para las pestañas de experimentos
 #############################
-def render_experiment_tab(exp_type, title, description, parameters, display_names, metric_functions, mapping):
+@st.cache_resource(show_spinner=False)
+def load_surrogate(data_file, _parameters, _mapping):
+    """
+    Ajusta una vez por proceso el modelo sustituto de la tabla experimental.
+    Lo comparten todas las sesiones, así que nunca se modifica: las mediciones
+    añadidas van a una copia de la sesión (ver `choose_metric_source`).
+    """
+    from surrogate import fit_from_file
+    return fit_from_file(data_file, _parameters, _mapping)
+
+def choose_metric_source(exp_type, parameters, metric_functions, mapping, data_file):
+    """
+    Permite elegir entre el modelo analítico y el modelo sustituto ajustado a la
+    tabla experimental. Retorna (clave del experimento, funciones métricas); la
+    clave separa los widgets y las entradas de caché de cada modelo. Sin tabla
+    experimental (`data_file` no definido) solo existe el modelo analítico.
+    Las mediciones subidas solo se añaden al modelo de la sesión que las sube
+    (una copia del compartido) y se pierden al cerrarla.
+    """
+    if data_file is None:
+        return exp_type, metric_functions
+    source = st.radio("Modelo", ["Analítico", "Datos experimentales (modelo sustituto)"], horizontal=True,
+                      key=f"{exp_type}_source")
+    if source == "Analítico":
+        return exp_type, metric_functions
+    exp_key = f"{exp_type}_datos"
+    shared = load_surrogate(data_file, parameters, mapping)
+    surrogate = st.session_state.get(f"{exp_key}_model", shared)
+    added = len(surrogate.X) - len(shared.X)
+    st.caption(f"Interpolante RBF ajustado a {len(shared.X)} mediciones de `{os.path.basename(data_file)}`"
+               + (f" y {added} añadidas en esta sesión." if added else "."))
+    with st.expander("Añadir mediciones"):
+        uploaded = st.file_uploader("Tabla JSON con el mismo formato que el archivo original", type="json",
+                                    key=f"{exp_key}_upload")
+        if uploaded is not None and st.button("Añadir al modelo", key=f"{exp_key}_append"):
+            from surrogate import parse_dataset
+            try:
+                X, names, Y = parse_dataset(json.load(uploaded), parameters, mapping)
+                missing = [name for name in surrogate.metric_names if name not in names]
+                if missing:
+                    raise ValueError(f"Faltan las métricas: {', '.join(missing)}")
+                if surrogate is shared:
+                    surrogate = shared.copy()
+                surrogate.append(X, Y[:, [names.index(name) for name in surrogate.metric_names]])
+            except ValueError as exc:
+                # También JSON mal formado (JSONDecodeError) y puntos repetidos (LinAlgError)
+                st.error(f"No se pudieron añadir las mediciones: {exc}")
+            else:
+                st.session_state[f"{exp_key}_model"] = surrogate
+                st.success(f"{len(X)} mediciones añadidas; el modelo se actualizó sin reajustarse desde cero.")
+    return exp_key, surrogate.metric_functions()
+
+@st.cache_resource(show_spinner=False, max_entries=256)
+def custom_metric(exp_type, formula):
+    """Métrica de una fórmula del usuario, compilada una sola vez por proceso."""
+    experiment = get_registry()[exp_type]
+    return ExpressionMetric(formula, experiment["parameters"], experiment["constants"], experiment["models"])
+
+def edit_custom_metrics(exp_type, formulas):
+    """Formulario para añadir fórmulas a `formulas` (etiqueta -> fórmula) y quitar las existentes."""
+    experiment = get_registry()[exp_type]
+    st.caption("Variables: " + ", ".join(f"`{key}`" for key in experiment["parameters"])
+               + ("; constantes: " + ", ".join(f"`{name}`" for name in experiment["constants"])
+                  if experiment["constants"] else "")
+               + ("; respuestas gaussianas: " + ", ".join(f"`{name}`" for name in experiment["models"])
+                  if experiment["models"] else "")
+               + ". Funciones: " + ", ".join(f"`{name}`" for name in FUNCTIONS) + ". Operaciones: + - * / **.")
+    with st.form(f"{exp_type}_custom_form", clear_on_submit=True):
+        name = st.text_input("Nombre de la métrica", key=f"{exp_type}_custom_name")
+        formula = st.text_input("Fórmula", placeholder="p. ej. Presion * exp(-((Temp - 90) / 15)**2)",
+                                key=f"{exp_type}_custom_formula")
+        if st.form_submit_button("Añadir métrica"):
+            try:
+                formula = normalize_formula(formula)
+                custom_metric(exp_type, formula)
+            except ExpressionError as exc:
+                st.error(f"No se pudo compilar la fórmula: {exc}")
+            else:
+                label = f"{name.strip() or 'Métrica'} = {formula}"
+                if label in experiment["metric_functions"]:
+                    st.error("Ya existe una métrica con ese nombre.")
+                else:
+                    formulas[label] = formula
+    for i, label in enumerate(list(formulas)):
+        col_label, col_button = st.columns([5, 1])
+        col_label.markdown(f"`{label}`")
+        if col_button.button("Quitar", key=f"{exp_type}_custom_remove_{i}"):
+            del formulas[label]
+
+def custom_metrics(exp_type, metric_functions):
+    """
+    Métricas definidas por el usuario con fórmulas sobre los parámetros del
+    experimento; se guardan en la sesión y se añaden a las del experimento en
+    todos los paneles. La etiqueta incluye la fórmula normalizada, así que las
+    cachés (y el almacén en disco) distinguen fórmulas distintas con el mismo nombre.
+    """
+    formulas = st.session_state.setdefault(f"{exp_type}_custom_metrics", {})
+    panel = st.expander("Métricas personalizadas (fórmulas)", key=f"{exp_type}_custom_panel", on_change="rerun")
+    if panel.open:
+        with panel:
+            edit_custom_metrics(exp_type, formulas)
+    return {**metric_functions, **{label: custom_metric(exp_type, formula) for label, formula in formulas.items()}}
+
+def choose_uncertainty(exp_type, parameters, display_names):
+    """
+    Configuración de la propagación de incertidumbre: distribución, número de
+    extracciones y tolerancia de cada parámetro (en % de su rango permitido;
+    desviación estándar si es normal, semiamplitud si es uniforme).
+    Retorna None si el modo está desactivado.
+    """
+    if not st.toggle("Propagar la incertidumbre de las entradas (tolerancias)", key=f"{exp_type}_uncertainty"):
+        return None
+    col_dist, col_draws = st.columns(2)
+    distribution = col_dist.radio("Distribución", ["Normal", "Uniforme"], horizontal=True,
+                                  key=f"{exp_type}_uncertainty_distribution")
+    n_draws = col_draws.select_slider("Extracciones por punto", options=[250, 500, 1000, 2000, 4000], value=1000,
+                                      key=f"{exp_type}_uncertainty_draws")
+    tolerances = {}
+    for col, (key, (low, high)) in zip(st.columns(len(parameters)), parameters.items()):
+        percent = col.number_input(f"± {display_names[key]} (% del rango)", min_value=0.0, max_value=50.0,
+                                   value=2.0, step=0.5, key=f"{exp_type}_tolerance_{key}")
+        tolerances[key] = percent / 100 * (high - low)
+    return {"distribution": "normal" if distribution == "Normal" else "uniform", "n_draws": n_draws,
+            "tolerances": tolerances}
+
+def keep_widget_state(exp_type):
+    """
+    Streamlit olvida el valor de los widgets que no se dibujan en una
+    re-ejecución. Con las pestañas perezosas, los de las pestañas cerradas se
+    reasignan a sí mismos para que el usuario los encuentre igual al volver.
+    """
+    for key in list(st.session_state):
+        if key.startswith(f"{exp_type}_"):
+            try:
+                st.session_state[key] = st.session_state[key]
+            except StreamlitAPIException:
+                # Botones y similares no admiten asignación (ni la necesitan)
+                pass
+
+# Etiquetas del selector de malla y valor de `grid` en `plot_continuous_metric`
+GRID_TYPES = {"Uniforme": "uniform", "Incremental": "incremental", "Adaptativa": "adaptive"}
+
+def render_experiment_tab(exp_type, title, description, parameters, display_names, metric_functions, mapping,
+                          data_file, time_saved):
     st.header(title)
     st.markdown(description)
+    exp_type, metric_functions = choose_metric_source(exp_type, parameters, metric_functions, mapping, data_file)
+    if exp_type in get_registry():
+        metric_functions = custom_metrics(exp_type, metric_functions)
     
     # Selección de variables a variar (mostrando nombres en español)
     display_options = list(mapping.keys())
@@ -413,10 +748,6 @@ def render_experiment_tab(exp_type, title, description, parameters, display_name
     metric_option = st.selectbox("Selecciona la métrica a optimizar", 
                                  list(metric_functions.keys()),
                                  key=f"{exp_type}_selectbox")
-    global current_parameters
-    current_parameters = parameters
-    global display_names_global
-    display_names_global = display_names  # para usar en la función de plot
     metric_func = metric_functions[metric_option]
     
     # Definir el rango de los parámetros a explorar
@@ -431,68 +762,76 @@ def render_experiment_tab(exp_type, title, description, parameters, display_name
                               value=(float(allowed_range[0]), float(allowed_range[1])),
                               key=f"{exp_type}_range_{var}")
         range_inputs[var] = range_val
-    n_points = st.slider("Número de puntos en la malla", 1, 100, 50, key=f"{exp_type}_points")
+    n_points = st.slider("Número de puntos en la malla", 1, 100, DEFAULT_POINTS, key=f"{exp_type}_points")
+    uncertainty = choose_uncertainty(exp_type, parameters, display_names)
+    grid = st.radio("Tipo de malla", list(GRID_TYPES), horizontal=True, key=f"{exp_type}_grid",
+                    disabled=uncertainty is not None,
+                    help="Incremental: al mover un deslizador solo se evalúan los puntos nuevos. "
+                         "Adaptativa: se refina solo donde la métrica se curva.")
     
+    goal = st.radio("Objetivo de la optimización", ["Maximizar", "Minimizar"],
+                    index=0 if default_maximize(metric_option) else 1, horizontal=True,
+                    key=f"{exp_type}_goal_{metric_option}")
     if st.button("Optimizar Parámetros", key=f"{exp_type}_button"):
-        simulate_optimization(metric_func, parameters, range_inputs, selected_vars, n_points, exp_type)
+        start_optimization(exp_type, metric_func, parameters, metric_option, maximize=(goal == "Maximizar"))
+    show_optimization_job(exp_type, parameters, display_names, metric_functions, range_inputs,
+                          selected_vars, n_points, time_saved)
     
     st.subheader("Visualización de la función continua")
     if selected_vars:
-        plot_continuous_metric(selected_vars, range_inputs, n_points, metric_func, metric_option, display_names)
+        plot_continuous_metric(exp_type, parameters, selected_vars, range_inputs, n_points, metric_func, metric_option,
+                               display_names, GRID_TYPES[grid], uncertainty)
     else:
         st.warning("Por favor, selecciona al menos una variable de entrada.")
 
+    # Paneles perezosos: su contenido solo se ejecuta mientras están abiertos
+    sweep_panel = st.expander("Barrido completo de todas las variables", key=f"{exp_type}_sweep_panel",
+                              on_change="rerun")
+    if sweep_panel.open:
+        with sweep_panel:
+            show_full_sweep(exp_type, parameters, display_names, metric_func, metric_option)
+
+    pareto_panel = st.expander("Frente de Pareto: compromisos entre métricas", key=f"{exp_type}_pareto_panel",
+                               on_change="rerun")
+    if pareto_panel.open:
+        with pareto_panel:
+            show_pareto_front(exp_type, parameters, display_names, metric_functions)
+
+    sensitivity_panel = st.expander("Análisis de sensibilidad global (Sobol / Morris)",
+                                    key=f"{exp_type}_sensitivity_panel", on_change="rerun")
+    if sensitivity_panel.open:
+        with sensitivity_panel:
+            show_sensitivity(exp_type, parameters, display_names, metric_functions, metric_option)
+
 #############################
 # Interfaz: pestañas para cada ejemplo y contacto
 #############################
-tabs = st.tabs(["Reacción Química", "Ingeniería de Materiales", "Materiales Biológicos", "Contacto"])
-
-# --- Pestaña 1: Reacción Química ---
-with tabs[0]:
-    render_experiment_tab(
-        exp_type="chem",
-        title="Ejemplo: Polimerización de Etileno (PE-UHMW)",
-        description="""
-La polimerización de etileno mediante catalizadores Ziegler-Natta es un proceso crítico en la industria petroquímica.  
-Optimiza parámetros como la concentración de TiCl₃, relación Al/Ti, temperatura y presión para maximizar el peso molecular, el rendimiento o minimizar costos.
-        """,
-        parameters=chem_parameters,
-        display_names=chem_display_names,
-        metric_functions=chem_metric_functions,
-        mapping=chem_display_to_key
-    )
-
-# --- Pestaña 2: Ingeniería de Materiales ---
-with tabs[1]:
-    render_experiment_tab(
-        exp_type="mat",
-        title="Ejemplo: Superaleaciones de Níquel",
-        description="""
-En la fabricación de componentes para turbinas de gas, la composición y el tratamiento térmico de superaleaciones de níquel determinan su resistencia y ductilidad.  
-Optimiza el porcentaje de Ni, Cr, la temperatura de solubilización y el tiempo de envejecimiento para mejorar la resistencia o reducir costos.
-        """,
-        parameters=material_parameters,
-        display_names=material_display_names,
-        metric_functions=material_metric_functions,
-        mapping=material_display_to_key
-    )
-
-# --- Pestaña 3: Materiales Biológicos ---
-with tabs[2]:
-    render_experiment_tab(
-        exp_type="bio",
-        title="Ejemplo: Producción de Anticuerpos Monoclonales",
-        description="""
-En la producción a gran escala de anticuerpos monoclonales, optimizar parámetros como la concentración de glucosa, pH, velocidad de agitación y estrategia de alimentación es clave para mejorar la productividad y calidad, reduciendo costos y residuos.
-        """,
-        parameters=bio_parameters,
-        display_names=bio_display_names,
-        metric_functions=bio_metric_functions,
-        mapping=bio_display_to_key
-    )
-
-# --- Pestaña 4: Contacto ---
-with tabs[3]:
+registry = get_registry()
+# Pestañas perezosas: en cada re-ejecución solo se construye y evalúa la abierta
+tabs = st.tabs([registry.definition(exp_type)["tab"] for exp_type in registry] + ["Contacto"],
+               key="experiment_tabs", on_change="rerun")
+
+# --- Una pestaña por experimento del registro ---
+for tab, exp_type in zip(tabs, registry):
+    if not tab.open:
+        keep_widget_state(exp_type)
+        continue
+    experiment = registry[exp_type]
+    with tab, timed(f"{exp_type}/total"):
+        render_experiment_tab(
+            exp_type=exp_type,
+            title=experiment["title"],
+            description=experiment["description"],
+            parameters=experiment["parameters"],
+            display_names=experiment["display_names"],
+            metric_functions=experiment["metric_functions"],
+            mapping=experiment["mapping"],
+            data_file=experiment["data_file"],
+            time_saved=experiment["time_saved"]
+        )
+
+# --- Última pestaña: Contacto ---
+with tabs[-1]:
     st.header("Contacto")
     st.markdown("""
 ¿Quieres optimizar tus procesos y reducir costes con inteligencia artificial?  
@@ -514,3 +853,10 @@ st.markdown(
     <meta name="keywords" content="QuimicAI, Optimización, Química, Ingeniería de Materiales, Anticuerpos, IA">
     """, unsafe_allow_html=True
 )
+
+#############################
+# Instrumentación: línea de log por re-ejecución y panel de administración
+#############################
+rerun_summary = end_rerun(rerun_recorder)
+if admin_enabled():
+    show_admin_panel(rerun_summary)
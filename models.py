@@ -0,0 +1,46 @@
+import numpy as np
+
+#############################
+# Modelos de respuesta gaussiana
+#############################
+
+class GaussianResponse:
+    """
+    Familia de métricas de la forma base + gain * exp(-0.5 * term), con
+    term = sum(((x - opt) / sigma)**2), que comparten los mismos opt/sigma.
+    Cada métrica es una entrada de los vectores `base`/`gain` (una reducción de
+    costo se expresa con gain negativo). La evaluación la hace el compilador de
+    `expressions`, que calcula `term` una sola vez para todas ellas.
+    """
+    __slots__ = ("names", "opt", "sigma", "base", "gain")
+
+    def __init__(self, opt, sigma, base, gain):
+        self.names = tuple(opt)
+        self.opt = np.array([opt[name] for name in self.names], dtype=np.float64)
+        self.sigma = np.array([sigma[name] for name in self.names], dtype=np.float64)
+        self.base = np.atleast_1d(np.asarray(base, dtype=np.float64))
+        self.gain = np.atleast_1d(np.asarray(gain, dtype=np.float64))
+
+    def metric(self, index=0):
+        """Función métrica (interfaz `metric_func(**args)`) para la métrica `index`."""
+        return GaussianMetric(self, index)
+
+
+class GaussianMetric:
+    """
+    Vista de una sola métrica de un `GaussianResponse` con la interfaz de las
+    funciones métricas. Se evalúa con el mismo `Program` que `compile_metrics`
+    genera para ella, compilado en la primera llamada.
+    """
+    __slots__ = ("model", "index", "program")
+
+    def __init__(self, model, index):
+        self.model = model
+        self.index = index
+        self.program = None
+
+    def __call__(self, **kwargs):
+        if self.program is None:
+            from expressions import compile_metrics
+            self.program = compile_metrics((self,))[0]
+        return self.program.run(kwargs)[0]
@@ -0,0 +1,73 @@
+import numpy as np
+from scipy.optimize import minimize
+from scipy.stats import qmc
+
+from evaluation import evaluate_points
+
+#############################
+# Optimización multi-arranque sobre la caja de parámetros
+#############################
+
+def optimize_metric(metric_func, parameters, maximize=True, n_samples=1024, n_starts=8,
+                    seed=0, progress=None):
+    """
+    Busca el óptimo de la métrica en toda la caja definida por `parameters`.
+    1. Evalúa una muestra Sobol de `n_samples` puntos en una sola llamada vectorizada.
+    2. Refina los `n_starts` mejores puntos con L-BFGS-B acotado; el gradiente se
+       obtiene por diferencias finitas evaluando los D+1 puntos en un único lote.
+    Trabaja en coordenadas normalizadas [0, 1]^D para que parámetros con escalas
+    muy distintas (p. ej. TiCl3 y Temp) tengan el mismo peso.
+    `progress(done, total, best)` se invoca tras cada arranque local con el mejor
+    resultado parcial ({"x": ..., "value": ...}).
+    Retorna un dict con el punto óptimo, su valor y el número de evaluaciones.
+    """
+    names = list(parameters)
+    low = np.array([parameters[name][0] for name in names], dtype=np.float64)
+    high = np.array([parameters[name][1] for name in names], dtype=np.float64)
+    span = high - low
+    sign = -1.0 if maximize else 1.0
+    n_evaluations = 0
+
+    def evaluate(unit_points):
+        nonlocal n_evaluations
+        n_evaluations += len(unit_points)
+        return evaluate_points(metric_func, parameters, low + unit_points * span)
+
+    sampler = qmc.Sobol(d=len(names), scramble=True, seed=seed)
+    samples = sampler.random_base2(int(np.ceil(np.log2(max(n_samples, 2)))))
+    values = evaluate(samples)
+    # Escala de la función objetivo para que las tolerancias de L-BFGS-B no
+    # dependan de las unidades de la métrica
+    scale = float(values.max() - values.min()) or 1.0
+    order = np.argsort(sign * values)
+
+    step = 1e-6
+    offsets = np.vstack([np.zeros(len(names)), np.eye(len(names)) * step])
+
+    def objective(u):
+        # Paso hacia dentro en el borde superior para no salir de la caja
+        direction = np.where(u + step > 1.0, -1.0, 1.0)
+        batch = np.clip(u + offsets * direction, 0.0, 1.0)
+        f = sign * evaluate(batch) / scale
+        return f[0], (f[1:] - f[0]) / (step * direction)
+
+    best_u, best_f = samples[order[0]], sign * values[order[0]] / scale
+    n_starts = min(n_starts, len(samples))
+    for i, start in enumerate(order[:n_starts]):
+        result = minimize(objective, samples[start], jac=True, method="L-BFGS-B",
+                          bounds=[(0.0, 1.0)] * len(names))
+        if result.fun < best_f:
+            best_u, best_f = result.x, result.fun
+        if progress is not None:
+            progress(i + 1, n_starts, {
+                "x": dict(zip(names, (low + best_u * span).tolist())),
+                "value": float(sign * best_f * scale),
+            })
+
+    best_x = low + best_u * span
+    return {
+        "x": {name: float(val) for name, val in zip(names, best_x)},
+        "value": float(evaluate_points(metric_func, parameters, best_x[None, :])[0]),
+        "maximize": maximize,
+        "n_evaluations": n_evaluations + 1,
+    }
@@ -0,0 +1,94 @@
+import numpy as np
+from scipy.stats import qmc
+
+from evaluation import evaluate_metrics
+
+#############################
+# Frente de Pareto multi-objetivo
+#############################
+
+# Tamaño a partir del cual el algoritmo de Kung deja de dividir y filtra por fuerza bruta
+_LEAF_SIZE = 64
+
+
+def pareto_front(costs):
+    """
+    Índices de las filas no dominadas de `costs` (N, K), minimizando todas las
+    columnas. Las filas repetidas no se dominan entre sí y se conservan todas.
+    Para K = 2 usa un barrido O(n log n) sobre las filas ordenadas; para K >= 3,
+    el algoritmo de divide y vencerás de Kung, con comparaciones vectorizadas.
+    """
+    costs = np.asarray(costs, dtype=np.float64)
+    if costs.ndim != 2 or len(costs) == 0:
+        return np.zeros(0, dtype=np.intp)
+    # Filas únicas en orden lexicográfico: una fila solo puede estar dominada por otra anterior
+    order = np.lexsort(costs.T[::-1])
+    ordered = costs[order]
+    new_row = np.ones(len(ordered), dtype=bool)
+    new_row[1:] = (ordered[1:] != ordered[:-1]).any(axis=1)
+    unique = ordered[new_row]
+    inverse = np.empty(len(costs), dtype=np.intp)
+    inverse[order] = np.cumsum(new_row) - 1
+    if unique.shape[1] == 1:
+        keep = np.zeros(len(unique), dtype=bool)
+        keep[0] = True
+    elif unique.shape[1] == 2:
+        prev_min = np.minimum.accumulate(unique[:, 1])
+        keep = np.ones(len(unique), dtype=bool)
+        keep[1:] = unique[1:, 1] < prev_min[:-1]
+    else:
+        keep = np.zeros(len(unique), dtype=bool)
+        keep[_kung(unique, 0, len(unique))] = True
+    return np.flatnonzero(keep[inverse])
+
+
+def _kung(rows, start, stop):
+    """Índices no dominados de rows[start:stop] (filas únicas en orden lexicográfico)."""
+    if stop - start <= _LEAF_SIZE:
+        block = rows[start:stop]
+        # weakly[j, i]: la fila j es <= que la fila i en todas las columnas (j != i ⇒ la domina)
+        weakly = _weakly_dominates(block, block)
+        np.fill_diagonal(weakly, False)
+        return start + np.flatnonzero(~weakly.any(axis=0))
+    middle = (start + stop) // 2
+    top = _kung(rows, start, middle)
+    bottom = _kung(rows, middle, stop)
+    return np.concatenate([top, bottom[~_dominated_by(rows[top], rows[bottom])]])
+
+
+def _dominated_by(front, candidates, chunk=4096):
+    """Máscara de `candidates` dominados por alguna fila de `front` (todas distintas)."""
+    dominated = np.zeros(len(candidates), dtype=bool)
+    step = max(1, chunk * 64 // max(len(front), 1))
+    for i in range(0, len(candidates), step):
+        block = candidates[i:i + step]
+        dominated[i:i + step] = _weakly_dominates(front, block).any(axis=0)
+    return dominated
+
+
+def _weakly_dominates(a, b):
+    """Matriz (len(a), len(b)): a[j] <= b[i] en todas las columnas (columna a columna, sin reducir)."""
+    result = a[:, None, 0] <= b[None, :, 0]
+    for col in range(1, a.shape[1]):
+        result &= a[:, None, col] <= b[None, :, col]
+    return result
+
+
+def sample_metrics(metric_functions, parameters, n_samples=2**14, seed=0):
+    """
+    Evalúa todas las métricas de `metric_functions` sobre una muestra Sobol común
+    de la caja de parámetros, en una sola pasada por lote.
+    Retorna (puntos (N, D), valores (N, K)).
+    """
+    names = list(parameters)
+    low = np.array([parameters[name][0] for name in names], dtype=np.float64)
+    high = np.array([parameters[name][1] for name in names], dtype=np.float64)
+    sampler = qmc.Sobol(d=len(names), scramble=True, seed=seed)
+    points = low + sampler.random_base2(int(np.ceil(np.log2(max(n_samples, 2))))) * (high - low)
+    return points, evaluate_metrics(metric_functions, parameters, points)
+
+
+def pareto_indices(values, maximize):
+    """Frente de Pareto de `values` (N, K); `maximize[k]` indica el sentido de cada columna."""
+    signs = np.where(np.asarray(maximize, dtype=bool), -1.0, 1.0)
+    return pareto_front(np.asarray(values) * signs)
@@ -0,0 +1,292 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from cache import surface_key
+from evaluation import evaluate_metric_function
+from experiments import default_maximize
+
+#############################
+# Almacén persistente de resultados compartido por los procesos del nodo
+#############################
+
+logger = logging.getLogger("quimicai.store")
+
+# Base de datos en disco local; QUIMICAI_STORE y QUIMICAI_STORE_MAX_MB permiten
+# cambiar la ruta y el tamaño máximo (todos los procesos deben usar los mismos)
+STORE_PATH = os.environ.get("QUIMICAI_STORE",
+                            os.path.join(os.path.expanduser("~"), ".cache", "quimicai", "results.sqlite"))
+STORE_MAX_BYTES = int(float(os.environ.get("QUIMICAI_STORE_MAX_MB", 1024)) * 2**20)
+
+# Se incrementa si cambia la forma de calcular o serializar los resultados
+STORE_VERSION = 1
+
+# Vista con la que se abre cada pestaña: primera variable en todo su rango
+DEFAULT_POINTS = 50
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    data BLOB NOT NULL,
+    nbytes INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+-- Ocupación total mantenida por disparadores, para no recorrer la tabla en cada escritura
+CREATE TABLE IF NOT EXISTS usage (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    nbytes INTEGER NOT NULL
+);
+INSERT INTO usage SELECT 0, (SELECT COUNT(*) FROM results), (SELECT COALESCE(SUM(nbytes), 0) FROM results)
+    WHERE NOT EXISTS (SELECT 1 FROM usage);
+CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN
+    UPDATE usage SET entries = entries + 1, nbytes = nbytes + new.nbytes WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN
+    UPDATE usage SET entries = entries - 1, nbytes = nbytes - old.nbytes WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF nbytes ON results BEGIN
+    UPDATE usage SET nbytes = nbytes - old.nbytes + new.nbytes WHERE id = 0;
+END;
+"""
+
+# Rutas cuyo esquema ya se creó en este proceso: solo la primera conexión a cada
+# base de datos toma el bloqueo de escritura para crearlo
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+
+def result_key(definition, *parts):
+    """
+    Clave estable de un resultado: hash de la definición del experimento (ver
+    `experiments.compile_experiment`) y de las partes que lo identifican
+    (métrica, variables, rangos, resolución, opciones...). Cambiar la
+    definición en `configs/` invalida así todos sus resultados.
+    """
+    payload = json.dumps([STORE_VERSION, definition, parts], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"No serializable: {type(value).__name__}")
+
+def encode(value):
+    """
+    Serializa un resultado sin pickle: tuplas de arrays (y escalares) como .npz,
+    diccionarios como JSON. Retorna (formato, bytes).
+    """
+    if isinstance(value, tuple):
+        buffer = io.BytesIO()
+        np.savez(buffer, *(np.asarray(item) for item in value))
+        return "npz", buffer.getvalue()
+    if isinstance(value, dict):
+        return "json", json.dumps(value, ensure_ascii=False, default=_json_default).encode("utf-8")
+    raise TypeError(f"Tipo de resultado no admitido en el almacén: {type(value).__name__}")
+
+def decode(kind, data):
+    if kind == "json":
+        return json.loads(data)
+    with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+        items = [archive[f"arr_{i}"] for i in range(len(archive.files))]
+    return tuple(item.item() if item.ndim == 0 else item for item in items)
+
+
+class ResultStore:
+    """
+    Resultados calculados guardados en SQLite (modo WAL): cualquier número de
+    procesos lee a la vez y las escrituras se serializan en transacciones, de
+    modo que todas las réplicas del nodo y los reinicios comparten lo calculado.
+    Cuando el total supera `max_bytes` se borran las entradas usadas hace más
+    tiempo. Los errores de disco no interrumpen la aplicación: se registran y
+    el resultado simplemente se recalcula.
+    """
+
+    # Entradas leídas por consulta al buscar qué expulsar
+    EVICT_BATCH = 64
+
+    # Un acceso solo se anota en disco si el anterior es más antiguo que esto (s),
+    # para que las lecturas frecuentes no se conviertan en escrituras
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, path=STORE_PATH, max_bytes=STORE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        """Conexión del hilo actual (sqlite3 no comparte conexiones entre hilos)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            path = os.path.abspath(self.path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with _schema_lock:
+                if path not in _schema_ready:
+                    # En una transacción: el total inicial de `usage` y los disparadores llegan juntos
+                    connection.executescript(f"BEGIN IMMEDIATE; {_SCHEMA} COMMIT;")
+                    _schema_ready.add(path)
+            self._local.connection = connection
+        return connection
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """Retorna el resultado guardado bajo `key` o None."""
+        try:
+            connection = self._connection()
+            row = connection.execute("SELECT kind, data, accessed FROM results WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None:
+                self._count(False)
+                return None
+            now = time.time()
+            if now - row[2] > self.TOUCH_INTERVAL:
+                connection.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+            value = decode(row[0], row[1])
+        except (sqlite3.Error, OSError, ValueError) as exc:
+            logger.warning("No se pudo leer del almacén %s: %s", self.path, exc)
+            self._count(False)
+            return None
+        self._count(True)
+        return value
+
+    def put(self, key, value):
+        """Guarda `value` bajo `key` y expulsa las entradas menos recientes si hace falta."""
+        kind, data = encode(value)
+        if len(data) > self.max_bytes:
+            return value
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                # UPSERT y no INSERT OR REPLACE: el reemplazo no activa los disparadores de borrado
+                connection.execute("""
+                    INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET kind = excluded.kind, data = excluded.data,
+                        nbytes = excluded.nbytes, created = excluded.created, accessed = excluded.accessed""",
+                                   (key, kind, data, len(data), now, now))
+                self._evict(connection, key)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except (sqlite3.Error, OSError) as exc:
+            logger.warning("No se pudo escribir en el almacén %s: %s", self.path, exc)
+        return value
+
+    def _evict(self, connection, keep):
+        """Borra las entradas usadas hace más tiempo (salvo `keep`) hasta volver a caber en max_bytes."""
+        excess = connection.execute("SELECT nbytes FROM usage WHERE id = 0").fetchone()[0] - self.max_bytes
+        while excess > 0:
+            victims = []
+            for key, nbytes in connection.execute(
+                    "SELECT key, nbytes FROM results WHERE key != ? ORDER BY accessed LIMIT ?",
+                    (keep, self.EVICT_BATCH)).fetchall():
+                victims.append((key,))
+                excess -= nbytes
+                if excess <= 0:
+                    break
+            if not victims:
+                break
+            connection.executemany("DELETE FROM results WHERE key = ?", victims)
+
+    def get_or_compute(self, key, compute):
+        """Retorna el resultado de `key`, calculándolo con `compute()` y guardándolo si no está."""
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def clear(self):
+        self._connection().execute("DELETE FROM results")
+
+    def stats(self):
+        """Contadores de uso (del proceso) y ocupación (de la base de datos compartida)."""
+        try:
+            entries, nbytes = self._connection().execute(
+                "SELECT entries, nbytes FROM usage WHERE id = 0").fetchone()
+        except (sqlite3.Error, OSError):
+            entries, nbytes = None, None
+        with self._lock:
+            return {
+                "path": self.path,
+                "entries": entries,
+                "nbytes": nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def default_views(experiment, n_points=DEFAULT_POINTS):
+    """
+    Vistas con las que se abre la pestaña del experimento, una por métrica:
+    (métrica, variables seleccionadas, rangos, resolución).
+    """
+    first, (low, high) = next(iter(experiment["parameters"].items()))
+    for metric in experiment["metric_functions"]:
+        yield metric, [first], {first: (float(low), float(high))}, n_points
+
+def optimization_key(definition, display_metric, maximize):
+    """Clave del resultado de `optimization.optimize_metric` con sus opciones por defecto."""
+    return result_key(definition, display_metric, "optimize", bool(maximize))
+
+def warm_up(experiments, store, optimize=True, progress=None):
+    """
+    Precalcula y guarda las vistas por defecto de todos los experimentos de
+    `experiments` y, con `optimize`, la optimización de cada métrica en su
+    sentido por defecto. `progress(exp_type, metric, computed)` se invoca por
+    cada resultado. Retorna el número de resultados calculados (no estaban).
+    """
+    computed = 0
+    for exp_type, experiment in experiments.items():
+        definition = experiment["definition"]
+        for metric, selected_vars, range_inputs, n_points in default_views(experiment):
+            metric_func = experiment["metric_functions"][metric]
+            key = result_key(definition, *surface_key(exp_type, metric, selected_vars, range_inputs, n_points)[1:])
+            found = store.get(key) is not None
+            if not found:
+                store.put(key, evaluate_metric_function(metric_func, experiment["parameters"], selected_vars,
+                                                        range_inputs, n_points))
+                computed += 1
+            if progress is not None:
+                progress(exp_type, metric, not found)
+            if optimize:
+                key = optimization_key(definition, metric, default_maximize(metric))
+                found = store.get(key) is not None
+                if not found:
+                    from optimization import optimize_metric
+                    store.put(key, optimize_metric(metric_func, experiment["parameters"],
+                                                   maximize=default_maximize(metric)))
+                    computed += 1
+                if progress is not None:
+                    progress(exp_type, f"{metric} (optimización)", not found)
+    return computed
+
+
+# Instancia única por proceso (cada hilo abre su propia conexión)
+result_store = ResultStore()
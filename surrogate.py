@@ -0,0 +1,174 @@
+import itertools
+import json
+import threading
+
+import numpy as np
+from scipy.linalg import cho_solve, cholesky, solve_triangular
+
+#############################
+# Modelos sustitutos ajustados a datos experimentales
+#############################
+
+# Versiones únicas en el proceso: dos modelos con la misma versión predicen lo mismo
+_versions = itertools.count(1)
+
+def load_dataset(path, parameters, display_to_key):
+    """Lee una tabla experimental en JSON (ver `parse_dataset`)."""
+    with open(path, encoding="utf-8") as f:
+        return parse_dataset(json.load(f), parameters, display_to_key)
+
+def parse_dataset(data, parameters, display_to_key):
+    """
+    Convierte una tabla experimental con el formato de `chem_data.json`
+    ({"variables": {nombre visible: valores}, "metrics": {métrica: valores}}).
+    Retorna (X (n, D) con las columnas en el orden de `parameters`,
+    nombres de las métricas, Y (n, K)). Una tabla que no sigue ese formato
+    lanza ValueError.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("variables"), dict) \
+            or not isinstance(data.get("metrics"), dict):
+        raise ValueError("La tabla debe tener los apartados 'variables' y 'metrics'")
+    unknown = [name for name in data["variables"] if name not in display_to_key]
+    if unknown:
+        raise ValueError(f"Variables desconocidas: {', '.join(unknown)}")
+    columns = {display_to_key[name]: values for name, values in data["variables"].items()}
+    missing = [key for key in parameters if key not in columns]
+    if missing:
+        raise ValueError(f"Faltan las variables: {', '.join(missing)}")
+    try:
+        X = np.column_stack([np.asarray(columns[key], dtype=np.float64) for key in parameters])
+        metric_names = list(data["metrics"])
+        Y = np.column_stack([np.asarray(data["metrics"][name], dtype=np.float64) for name in metric_names])
+    except TypeError as exc:
+        raise ValueError(f"Valores no numéricos en la tabla ({exc})") from None
+    if len(Y) != len(X):
+        raise ValueError(f"La tabla tiene {len(X)} filas de variables y {len(Y)} de métricas")
+    if not (np.isfinite(X).all() and np.isfinite(Y).all()):
+        raise ValueError("La tabla contiene valores vacíos o no finitos")
+    return X, metric_names, Y
+
+
+class RBFSurrogate:
+    """
+    Interpolante de funciones de base radial gaussianas (equivalente a la media
+    posterior de un proceso gaussiano con media constante), con una salida por
+    métrica y todas compartiendo la misma factorización.
+    Las entradas se normalizan a [0, 1] con la caja de `parameters`.
+    `append` incorpora filas nuevas ampliando el factor de Cholesky por bloques,
+    en O(n²·m) en lugar de refactorizar en O(n³).
+    """
+
+    def __init__(self, parameters, metric_names, length_scale=0.3, nugget=1e-8):
+        self.parameters = parameters
+        self.names = list(parameters)
+        self.metric_names = list(metric_names)
+        self.low = np.array([parameters[key][0] for key in self.names], dtype=np.float64)
+        self.span = np.array([parameters[key][1] - parameters[key][0] for key in self.names], dtype=np.float64)
+        self.length_scale = length_scale
+        self.nugget = nugget
+        self.X = np.zeros((0, len(self.names)))
+        self.Y = np.zeros((0, len(self.metric_names)))
+        self.L = np.zeros((0, 0))
+        self.mean = np.zeros(len(self.metric_names))
+        self.alpha = np.zeros((0, len(self.metric_names)))
+        # Cambia con cada `fit`/`append` (y es única en el proceso), para no
+        # reutilizar resultados derivados de otro modelo o de una versión anterior
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def _normalize(self, points):
+        return (np.asarray(points, dtype=np.float64) - self.low) / self.span
+
+    def _kernel(self, a, b):
+        sq = (np.square(a).sum(axis=1)[:, None] + np.square(b).sum(axis=1)[None, :] - 2 * a @ b.T)
+        return np.exp(-np.maximum(sq, 0.0) / (2 * self.length_scale**2))
+
+    def fit(self, X, Y):
+        """Ajusta el modelo desde cero con las filas (X, Y)."""
+        with self._lock:
+            self.X = np.zeros((0, len(self.names)))
+            self.Y = np.zeros((0, len(self.metric_names)))
+            self.L = np.zeros((0, 0))
+            self._extend(X, Y)
+        return self
+
+    def copy(self):
+        """
+        Copia independiente con los mismos datos y la misma versión; `append`
+        sobre la copia no afecta al original. Los arrays se comparten porque
+        `fit` y `append` siempre los sustituyen en lugar de modificarlos.
+        """
+        with self._lock:
+            other = RBFSurrogate(self.parameters, self.metric_names, self.length_scale, self.nugget)
+            other.X, other.Y, other.L = self.X, self.Y, self.L
+            other.mean, other.alpha, other.version = self.mean, self.alpha, self.version
+        return other
+
+    def append(self, X, Y):
+        """
+        Incorpora filas nuevas sin refactorizar las ya ajustadas. Las columnas de
+        `Y` siguen el orden de `metric_names`.
+        """
+        with self._lock:
+            self._extend(X, Y)
+        return self
+
+    def _extend(self, X, Y):
+        U = self._normalize(np.atleast_2d(X))
+        Y = np.atleast_2d(np.asarray(Y, dtype=np.float64))
+        K12 = self._kernel(self._normalize(self.X), U)
+        K22 = self._kernel(U, U) + self.nugget * np.eye(len(U))
+        # Cholesky por bloques: [[L, 0], [B^T, L22]] con B = L^-1 K12 y L22 = chol(K22 - B^T B)
+        B = solve_triangular(self.L, K12, lower=True) if len(self.L) else np.zeros((0, len(U)))
+        L22 = cholesky(K22 - B.T @ B, lower=True)
+        n, m = len(self.L), len(U)
+        L = np.zeros((n + m, n + m))
+        L[:n, :n] = self.L
+        L[n:, :n] = B.T
+        L[n:, n:] = L22
+        X = np.vstack([self.X, np.atleast_2d(X)])
+        Y = np.vstack([self.Y, Y])
+        # La media y los pesos se recalculan con dos sustituciones triangulares (O(n²))
+        mean = Y.mean(axis=0)
+        alpha = cho_solve((L, True), Y - mean)
+        # El modelo solo cambia si todo lo anterior tuvo éxito
+        self.L, self.X, self.Y, self.mean, self.alpha = L, X, Y, mean, alpha
+        self.version = next(_versions)
+
+    def predict(self, points, chunk_size=2**16):
+        """Predice todas las métricas en una matriz de puntos (N, D); retorna (N, K)."""
+        points = np.asarray(points, dtype=np.float64)
+        with self._lock:
+            X, alpha, mean = self._normalize(self.X), self.alpha, self.mean
+        U = self._normalize(points.reshape(-1, len(self.names)))
+        out = np.empty((len(U), len(self.metric_names)))
+        for start in range(0, len(U), chunk_size):
+            out[start:start + chunk_size] = mean + self._kernel(U[start:start + chunk_size], X) @ alpha
+        return out.reshape(points.shape[:-1] + (len(self.metric_names),))
+
+    def metric(self, index):
+        """Función métrica (interfaz `metric_func(**args)`) para la métrica `index`."""
+        return SurrogateMetric(self, index)
+
+    def metric_functions(self):
+        """Diccionario {nombre de métrica: función} con la misma interfaz que `*_metric_functions`."""
+        return {name: self.metric(i) for i, name in enumerate(self.metric_names)}
+
+
+class SurrogateMetric:
+    """Vista de una métrica de un `RBFSurrogate` con la interfaz de las funciones métricas."""
+    __slots__ = ("model", "index")
+
+    def __init__(self, model, index):
+        self.model = model
+        self.index = index
+
+    def __call__(self, **kwargs):
+        columns = np.broadcast_arrays(*(np.asarray(kwargs[key], dtype=np.float64) for key in self.model.names))
+        return self.model.predict(np.stack(columns, axis=-1))[..., self.index]
+
+
+def fit_from_file(path, parameters, display_to_key, **kwargs):
+    """Carga la tabla experimental y ajusta un `RBFSurrogate` con todas sus métricas."""
+    X, metric_names, Y = load_dataset(path, parameters, display_to_key)
+    return RBFSurrogate(parameters, metric_names, **kwargs).fit(X, Y)
@@ -0,0 +1,174 @@
+import math
+
+import numpy as np
+
+from evaluation import call_metric, evaluate_points
+
+#############################
+# Barrido factorial completo por bloques
+#############################
+
+def _pilot_range(metric_func, parameters, axes, n_pilot=5):
+    """Rango aproximado de la métrica a partir de una malla gruesa, para iniciar el histograma."""
+    coarse = [axis[np.linspace(0, len(axis) - 1, min(n_pilot, len(axis))).astype(int)] for axis in axes]
+    grid = np.stack(np.meshgrid(*coarse, indexing="ij"), axis=-1).reshape(-1, len(axes))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        values = evaluate_points(metric_func, parameters, grid)
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return -1.0, 1.0
+    low, high = float(values.min()), float(values.max())
+    margin = 0.05 * (high - low) or 0.05 * abs(high) or 1.0
+    return low - margin, high + margin
+
+
+class StreamingHistogram:
+    """
+    Histograma de `bins` intervalos iguales que se amplía al vuelo: si llega un
+    valor fuera de rango, se fusionan los intervalos por parejas (duplicando su
+    ancho) y el rango crece hacia ese lado. Los conteos son exactos y la memoria
+    es constante; el rango final es, como mucho, el doble del necesario. Los
+    valores no finitos (inf, NaN) se ignoran.
+    """
+
+    def __init__(self, low, high, bins=50):
+        self.bins = bins + bins % 2
+        self.low = low
+        self.width = (high - low) / self.bins or 1.0
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+
+    def _grow(self, upward):
+        merged = self.counts.reshape(-1, 2).sum(axis=1)
+        self.counts = np.zeros_like(self.counts)
+        half = self.bins // 2
+        if upward:
+            self.counts[:half] = merged
+        else:
+            self.counts[half:] = merged
+            self.low -= self.bins * self.width
+        self.width *= 2
+
+    def update(self, values):
+        values = np.ravel(values)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        while values.min() < self.low:
+            self._grow(upward=False)
+        while values.max() >= self.low + self.bins * self.width:
+            self._grow(upward=True)
+        index = ((values - self.low) / self.width).astype(np.intp)
+        self.counts += np.bincount(np.minimum(index, self.bins - 1), minlength=self.bins)
+
+    @property
+    def edges(self):
+        return self.low + self.width * np.arange(self.bins + 1)
+
+
+def sweep_metric(metric_func, parameters, n_points, ranges=None, chunk_size=2**20, bins=50, progress=None):
+    """
+    Barrido factorial completo de la métrica sobre todas las variables de
+    `parameters` (n_points por eje, n_points**D puntos en total) sin materializar
+    la malla: se recorre en bloques de a lo sumo `chunk_size` puntos, formados
+    por los ejes finales completos y un índice fijo de los ejes iniciales, que se
+    evalúan con difusión (broadcast). Solo se conservan reducciones acumuladas:
+    mínimo/máximo y su posición, media y desviación, un histograma de `bins`
+    intervalos y la media marginal a lo largo de cada eje, de modo que la memoria
+    pico no depende de la resolución. El histograma empieza en el rango de una
+    malla gruesa de prueba y se amplía si el barrido encuentra valores fuera de él.
+    Los puntos donde la métrica no es finita (p. ej. 1/0 o log de un negativo en
+    una fórmula) se excluyen de todas las reducciones y se cuentan en `n_nonfinite`.
+    `ranges` permite acotar algunos ejes (por defecto, el rango completo).
+    `progress(done, total, partial)` se invoca tras cada bloque.
+    """
+    names = list(parameters)
+    ranges = {**parameters, **(ranges or {})}
+    axes = [np.linspace(*ranges[name], n_points) for name in names]
+    shape = tuple(len(axis) for axis in axes)
+    total = math.prod(shape)
+
+    # Ejes finales que caben en un bloque; el resto se recorre índice a índice
+    split = len(shape) - 1
+    while split > 0 and math.prod(shape[split - 1:]) <= chunk_size:
+        split -= 1
+    block_shape = shape[split:]
+    block_size = math.prod(block_shape)
+    n_blocks = math.prod(shape[:split])
+
+    histogram = StreamingHistogram(*_pilot_range(metric_func, parameters, axes), bins=bins)
+    marginal_sums = [np.zeros(n) for n in shape]
+    marginal_counts = [np.zeros(n) for n in shape]
+    count, mean, m2 = 0, 0.0, 0.0
+    n_nonfinite = 0
+    best_min = (np.inf, None)
+    best_max = (-np.inf, None)
+
+    for done, lead in enumerate(np.ndindex(*shape[:split]), start=1):
+        args = {}
+        for d, name in enumerate(names):
+            if d < split:
+                args[name] = axes[d][lead[d]]
+            else:
+                # Eje d orientado para difundir sobre la forma del bloque
+                args[name] = axes[d].reshape([-1 if k == d - split else 1 for k in range(len(block_shape))])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = call_metric(metric_func, args, block_shape)
+        finite = np.isfinite(values)
+        block_count = int(finite.sum())
+        if block_count < block_size:
+            # Los no finitos no cuentan: 0 en las sumas, ±inf en la búsqueda de extremos
+            n_nonfinite += block_size - block_count
+            minimum = np.where(finite, values, np.inf)
+            maximum = np.where(finite, values, -np.inf)
+            values = np.where(finite, values, 0.0)
+        else:
+            minimum = maximum = values
+
+        flat_min, flat_max = int(minimum.argmin()), int(maximum.argmax())
+        if minimum.flat[flat_min] < best_min[0]:
+            best_min = (float(minimum.flat[flat_min]), lead + np.unravel_index(flat_min, block_shape))
+        if maximum.flat[flat_max] > best_max[0]:
+            best_max = (float(maximum.flat[flat_max]), lead + np.unravel_index(flat_max, block_shape))
+        block_sum = float(values.sum())
+        if block_count:
+            # Media y varianza acumuladas combinando bloques (Chan et al.), estable numéricamente
+            block_mean = block_sum / block_count
+            block_m2 = float(np.square(values[finite] - block_mean).sum() if block_count < block_size
+                             else np.square(values - block_mean).sum())
+            delta = block_mean - mean
+            count += block_count
+            mean += delta * block_count / count
+            m2 += block_m2 + delta**2 * block_count * (count - block_count) / count
+
+        histogram.update(minimum)
+
+        for d in range(split):
+            marginal_sums[d][lead[d]] += block_sum
+            marginal_counts[d][lead[d]] += block_count
+        for k in range(len(block_shape)):
+            other = tuple(j for j in range(len(block_shape)) if j != k)
+            marginal_sums[split + k] += values.sum(axis=other) if other else values
+            if block_count == block_size:
+                marginal_counts[split + k] += block_size // block_shape[k]
+            else:
+                marginal_counts[split + k] += finite.sum(axis=other) if other else finite
+
+        if progress is not None:
+            progress(done, n_blocks, {"min": best_min[0], "max": best_max[0], "evaluated": done * block_size})
+
+    if count == 0:
+        raise ValueError("La métrica no toma ningún valor finito en el rango barrido")
+    with np.errstate(invalid="ignore"):
+        marginal_means = {name: (axes[d], marginal_sums[d] / marginal_counts[d]) for d, name in enumerate(names)}
+    return {
+        "n_evaluations": total,
+        "n_nonfinite": n_nonfinite,
+        "min": best_min[0],
+        "max": best_max[0],
+        "argmin": {name: float(axes[d][best_min[1][d]]) for d, name in enumerate(names)},
+        "argmax": {name: float(axes[d][best_max[1][d]]) for d, name in enumerate(names)},
+        "mean": mean,
+        "std": math.sqrt(m2 / count),
+        "histogram": (histogram.counts, histogram.edges),
+        "marginal_means": marginal_means,
+    }
@@ -0,0 +1,113 @@
+import os
+
+import numpy as np
+import pytest
+
+from evaluation import evaluate_metrics
+from experiments import compile_experiment, load_definition
+from expressions import (MAX_FORMULA_DEPTH, MAX_FORMULA_LENGTH, ExpressionError, ExpressionMetric,
+                         normalize_formula, parse_expression)
+from models import GaussianResponse
+
+PARAMETERS = {"x": (0.0, 1.0), "y": (1.0, 2.0)}
+CHEM_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "configs", "chem.json")
+
+
+def gaussian_unit(model, values):
+    """exp(-0.5 * term) escrito directamente con NumPy, sumando `term` en el orden de `model.names`."""
+    term = 0
+    for name, opt, sigma in zip(model.names, model.opt, model.sigma):
+        term = term + ((values[name] - opt) / sigma)**2
+    return np.exp(-0.5 * term)
+
+
+def gaussian_reference(model, index, values):
+    return model.base[index] + model.gain[index] * gaussian_unit(model, values)
+
+
+@pytest.mark.parametrize("source", [
+    "x.real",
+    "x.__class__",
+    "np.exp(x)",
+    "().__class__.__bases__",
+])
+def test_rejects_attribute_access(source):
+    with pytest.raises(ExpressionError):
+        parse_expression(source, set(PARAMETERS))
+
+
+@pytest.mark.parametrize("source", [
+    "eval('1')",
+    "open(x)",
+    "__import__('os')",
+    "getattr(x, 'real')",
+    "exp",
+    "(lambda: x)()",
+    "x(y)",
+])
+def test_rejects_calls_outside_functions(source):
+    with pytest.raises(ExpressionError):
+        parse_expression(source, set(PARAMETERS))
+
+
+@pytest.mark.parametrize("source", ["x[0]", "x if y else 1", "x < y", "[x, y]", "'texto'", "z + 1"])
+def test_rejects_other_syntax_and_unknown_names(source):
+    with pytest.raises(ExpressionError):
+        parse_expression(source, set(PARAMETERS))
+
+
+def test_accepts_allowed_formula():
+    metric = ExpressionMetric("sqrt(x) * maximum(y, 1.5) - 2 ** -x", PARAMETERS)
+    x, y = np.linspace(0, 1, 7), np.linspace(1, 2, 7)
+    np.testing.assert_array_equal(metric(x=x, y=y), np.sqrt(x) * np.maximum(y, 1.5) - 2.0 ** -x)
+
+
+def test_rejects_formula_over_max_length():
+    source = "+".join(["x"] * (MAX_FORMULA_LENGTH // 2 + 1))
+    assert len(source) > MAX_FORMULA_LENGTH
+    with pytest.raises(ExpressionError, match="larga"):
+        parse_expression(source, set(PARAMETERS))
+    with pytest.raises(ExpressionError):
+        normalize_formula(source)
+
+
+def test_rejects_formula_over_max_depth():
+    source = "exp(" * MAX_FORMULA_DEPTH + "x" + ")" * MAX_FORMULA_DEPTH
+    assert len(source) <= MAX_FORMULA_LENGTH
+    with pytest.raises(ExpressionError, match="anidada"):
+        parse_expression(source, set(PARAMETERS))
+    with pytest.raises(ExpressionError):
+        ExpressionMetric("-" * (2 * MAX_FORMULA_DEPTH) + "x", PARAMETERS)
+
+
+def test_gaussian_metrics_match_reference():
+    model = GaussianResponse(opt={"x": 0.3, "y": 1.4}, sigma={"x": 0.2, "y": 0.5},
+                             base=[10.0, 5.0], gain=[2.0, -3.0])
+    rng = np.random.default_rng(0)
+    values = {"x": rng.random(1000), "y": 1 + rng.random(1000)}
+    for index in range(2):
+        np.testing.assert_array_equal(model.metric(index)(**values), gaussian_reference(model, index, values))
+
+
+def test_compiled_experiment_matches_reference():
+    # Fórmulas y métricas gaussianas de un mismo modelo compiladas juntas por `evaluate_metrics`
+    experiment = compile_experiment(load_definition(CHEM_CONFIG), CHEM_CONFIG)
+    parameters, constants, models = experiment["parameters"], experiment["constants"], experiment["models"]
+    rng = np.random.default_rng(1)
+    points = np.column_stack([rng.uniform(*parameters[name], 5000) for name in parameters])
+    values = {name: points[:, j] for j, name in enumerate(parameters)}
+    result = evaluate_metrics(experiment["metric_functions"], parameters, points)
+
+    kinetic = constants["A0"] * gaussian_unit(models["modulacion_A"], values) * np.exp(
+        -constants["Ea"] / (constants["R"] * (values["Temp"] + 273.15)))
+    expected = {
+        "Constante Cinética": kinetic,
+        "Velocidad de Polimerización": kinetic * values["Presion"],
+    }
+    for position, (name, metric_func) in enumerate(experiment["metric_functions"].items()):
+        if name in expected:
+            reference = expected[name]
+        else:
+            reference = gaussian_reference(metric_func.model, metric_func.index, values)
+        np.testing.assert_array_equal(result[:, position], reference)
+        np.testing.assert_array_equal(metric_func(**values), reference)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from pareto import _LEAF_SIZE, pareto_front, pareto_indices
+
+
+def brute_force_front(costs):
+    """Referencia O(n²): una fila está en el frente si ninguna otra la domina."""
+    costs = np.asarray(costs, dtype=np.float64)
+    keep = []
+    for i, row in enumerate(costs):
+        dominated = ((costs <= row).all(axis=1) & (costs < row).any(axis=1)).any()
+        if not dominated:
+            keep.append(i)
+    return np.array(keep, dtype=np.intp)
+
+
+@pytest.mark.parametrize("k", [2, 3])
+@pytest.mark.parametrize("n", [1, 5, _LEAF_SIZE, 4 * _LEAF_SIZE + 3])
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_brute_force_continuous(k, n, seed):
+    costs = np.random.default_rng(seed).random((n, k))
+    np.testing.assert_array_equal(pareto_front(costs), brute_force_front(costs))
+
+
+@pytest.mark.parametrize("k", [2, 3])
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_brute_force_with_ties_and_duplicates(k, seed):
+    # Pocos valores distintos: muchos empates por columna y filas repetidas
+    costs = np.random.default_rng(seed).integers(0, 4, size=(6 * _LEAF_SIZE, k))
+    np.testing.assert_array_equal(pareto_front(costs), brute_force_front(costs))
+
+
+@pytest.mark.parametrize("k", [2, 3])
+def test_duplicated_optimum_keeps_every_copy(k):
+    costs = np.vstack([np.ones((3, k)), np.zeros((4, k)), np.full((2, k), 2.0)])
+    np.testing.assert_array_equal(pareto_front(costs), [3, 4, 5, 6])
+
+
+def test_equal_in_one_column_is_dominated():
+    costs = [[1.0, 2.0, 3.0], [1.0, 2.0, 4.0], [0.0, 5.0, 5.0]]
+    np.testing.assert_array_equal(pareto_front(costs), [0, 2])
+
+
+def test_empty_input():
+    assert len(pareto_front(np.zeros((0, 3)))) == 0
+
+
+def test_pareto_indices_flips_maximized_columns():
+    values = np.random.default_rng(0).random((300, 3))
+    maximize = [True, False, True]
+    expected = brute_force_front(values * np.array([-1.0, 1.0, -1.0]))
+    np.testing.assert_array_equal(pareto_indices(values, maximize), expected)